@@ -0,0 +1,124 @@
+# ABOUTME: Chart spec presets and reusable Chart.js templates for create_visualization
+# ABOUTME: Maps free-text data queries onto declarative specs and renders query results into chart configs
+import copy
+
+PALETTE = [
+    "79, 70, 229",
+    "124, 58, 237",
+    "236, 72, 153",
+    "34, 197, 94",
+    "249, 115, 22",
+    "59, 130, 246",
+    "168, 85, 247",
+    "244, 63, 94",
+]
+
+_TITLE_COLOR = "#f1f5f9"
+_TICK_COLOR = "#94a3b8"
+_GRID_COLOR = "rgba(148, 163, 184, 0.1)"
+
+# Keyword presets, checked in order; the first whose keywords all appear wins
+PRESETS = [
+    (("customer", "ticket"), {"entity": "tickets", "measure": "count", "dimension": "customer", "top_k": 8}, "Customer Activity"),
+    (("customer", "activity"), {"entity": "tickets", "measure": "count", "dimension": "customer", "top_k": 8}, "Customer Activity"),
+    (("ticket", "status"), {"entity": "tickets", "measure": "count", "dimension": "status"}, "Ticket Status Distribution"),
+    (("ticket", "resolution"), {"entity": "tickets", "measure": "count", "dimension": "status"}, "Ticket Status Distribution"),
+    (("priority",), {"entity": "tickets", "measure": "count", "dimension": "priority"}, "Tickets by Priority"),
+    (("category",), {"entity": "tickets", "measure": "count", "dimension": "category"}, "Tickets by Category"),
+    (("sla",), {"entity": "tickets", "measure": "sla_breaches", "dimension": "customer", "top_k": 8}, "SLA Breaches by Customer"),
+    (("revenue", "region"), {"entity": "customers", "measure": "mrr", "dimension": "region"}, "MRR by Region"),
+    (("revenue",), {"entity": "customers", "measure": "mrr", "dimension": "plan_type"}, "MRR by Plan"),
+    (("mrr",), {"entity": "customers", "measure": "mrr", "dimension": "plan_type"}, "MRR by Plan"),
+    (("health",), {"entity": "customers", "measure": "count", "dimension": "health_band"}, "Customer Health Distribution"),
+    (("industry",), {"entity": "customers", "measure": "count", "dimension": "industry"}, "Customers by Industry"),
+    (("interaction",), {"entity": "interactions", "measure": "count", "dimension": "type"}, "Interactions by Type"),
+    (("trend",), {"entity": "tickets", "measure": "count", "time_bucket": "week"}, "Ticket Trends Over Time"),
+    (("time",), {"entity": "tickets", "measure": "count", "time_bucket": "week"}, "Ticket Trends Over Time"),
+]
+
+DEFAULT_PRESET = PRESETS[0]
+
+MEASURE_LABELS = {
+    "count": "Count",
+    "open": "Open Tickets",
+    "sla_breaches": "SLA Breaches",
+    "avg_satisfaction": "Avg Satisfaction",
+    "mrr": "MRR",
+    "avg_mrr": "Avg MRR",
+    "avg_health": "Avg Health Score",
+}
+
+
+def spec_for_query(data_query: str):
+    """Return (spec, default title) for a free-text data query."""
+    query = data_query.lower()
+    for keywords, spec, title in PRESETS:
+        if all(keyword in query for keyword in keywords):
+            return dict(spec), title
+    _, spec, title = DEFAULT_PRESET
+    return dict(spec), title
+
+
+def _title_plugin(title: str) -> dict:
+    return {
+        "title": {"display": True, "text": title, "color": _TITLE_COLOR, "font": {"size": 16}},
+        "legend": {"labels": {"color": _TITLE_COLOR}},
+    }
+
+
+_AXES = {
+    "y": {"ticks": {"color": _TICK_COLOR}, "grid": {"color": _GRID_COLOR}},
+    "x": {"ticks": {"color": _TICK_COLOR}, "grid": {"color": _GRID_COLOR}},
+}
+
+
+def _colors(n: int, alpha: float) -> list:
+    return [f"rgba({PALETTE[i % len(PALETTE)]}, {alpha})" for i in range(n)]
+
+
+def render_chart(chart_type: str, labels: list, values: list, title: str, series_label: str) -> dict:
+    """Fill the Chart.js template for a chart type with query results."""
+    if chart_type in ("pie", "doughnut"):
+        labels, values = labels[:6], values[:6]
+        return {
+            "type": "doughnut",
+            "data": {
+                "labels": labels,
+                "datasets": [{
+                    "data": values,
+                    "backgroundColor": _colors(len(values), 0.8),
+                    "borderColor": _colors(len(values), 1),
+                    "borderWidth": 2,
+                }],
+            },
+            "options": {"responsive": True, "plugins": _title_plugin(title)},
+        }
+
+    if chart_type == "line":
+        dataset = {
+            "label": series_label,
+            "data": values,
+            "borderColor": f"rgba({PALETTE[0]}, 1)",
+            "backgroundColor": f"rgba({PALETTE[0]}, 0.1)",
+            "borderWidth": 3,
+            "fill": True,
+            "tension": 0.4,
+        }
+    else:
+        dataset = {
+            "label": series_label,
+            "data": values,
+            "backgroundColor": _colors(len(values), 0.8),
+            "borderColor": _colors(len(values), 1),
+            "borderWidth": 2,
+            "borderRadius": 8,
+        }
+    return {
+        "type": "line" if chart_type == "line" else "bar",
+        "data": {"labels": labels, "datasets": [dataset]},
+        "options": {
+            "responsive": True,
+            "plugins": _title_plugin(title),
+            "scales": copy.deepcopy(_AXES),
+        },
+    }
@@ -1,73 +1,145 @@
 # ABOUTME: Simple chat-based agent server
 # ABOUTME: Handles chat messages and executes tasks using OpenAI function calling
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import json
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agent.crew import run_task
+from agent.http_client import close_client, connection_stats
+from agent.intents import answer_directly, detect_view
+from agent.openai_client import close_model_client
+from agent.publisher import publisher
+from agent.response_cache import get_response_cache
+from agent.scheduler import AGENT_SCHEDULER_ENABLED, scheduler
+from agent.sessions import Session, sessions
 
 app = FastAPI(title="AgentChat", version="1.0.0")
 
 
+@app.on_event("startup")
+async def start_scheduler():
+    if AGENT_SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def drain_publisher():
+    # Final logs and late intents are still queued; the loop closing would cancel their sender
+    await publisher.drain()
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    await close_model_client()
+    await close_client()
+
+
 class ChatRequest(BaseModel):
     message: str
+    # Continue an earlier conversation; omitted or expired ids start a new one
+    session_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     response: str
     view_change: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+async def _direct_answer(message: str, session: Session):
+    """Fast-path answer for the message, recorded as a turn so follow-ups can refer to it."""
+    direct = await answer_directly(message)
+    if direct is not None:
+        session.record([{"role": "user", "content": message}, {"role": "assistant", "content": direct["response"]}])
+    return direct
 
 
 @app.post("/process")
 async def process_message(request: ChatRequest) -> ChatResponse:
     """Process a chat message and execute the corresponding task."""
+    session = sessions.get(request.session_id)
     try:
-        # Run the task using the agent
-        result = await run_task(request.message)
-
-        # Determine view change based on message content and agent response
-        view_change = None
-        msg_lower = request.message.lower()
-        result_lower = result.lower()
-
-        # Check agent response for explicit view mentions
-        if "view:" in result_lower:
-            view_parts = result_lower.split("view:")
-            if len(view_parts) > 1:
-                view_change = view_parts[1].split()[0].strip()
-        
-        # Fallback to message-based view detection
-        if not view_change:
-            if "workflow" in msg_lower or ("onboard" in msg_lower or "escalation" in msg_lower or any(word in msg_lower for word in ["run", "execute"]) and any(word in msg_lower for word in ["workflow", "process"])):
-                view_change = "workflow"
-            elif "triage" in msg_lower or ("ticket" in msg_lower and any(word in msg_lower for word in ["show", "view", "display"])):
-                view_change = "triage"
-            elif "analytics" in msg_lower or "report" in msg_lower or "stats" in msg_lower:
-                view_change = "analytics"
-            elif "dashboard" in msg_lower or "summary" in msg_lower or "overview" in msg_lower:
-                view_change = "dashboard"
-            elif "customer" in msg_lower and any(word in msg_lower for word in ["list", "show", "browse"]):
-                view_change = "customer-list"
-            elif "timeline" in msg_lower:
-                view_change = "timeline"
-            elif "calendar" in msg_lower:
-                view_change = "calendar"
-
-        return ChatResponse(response=result, view_change=view_change)
+        async with session.lock:
+            # Navigation and simple lookups don't need the model
+            direct = await _direct_answer(request.message, session)
+            if direct is not None:
+                return ChatResponse(response=direct["response"], view_change=direct["view_change"], session_id=session.id)
+
+            # Run the task using the agent
+            result = await run_task(request.message, session=session)
+        return ChatResponse(response=result, view_change=detect_view(request.message, result), session_id=session.id)
 
     except Exception as e:
         return ChatResponse(
-            response=f"Sorry, I encountered an error: {str(e)}", view_change=None
+            response=f"Sorry, I encountered an error: {str(e)}", view_change=None, session_id=session.id
         )
 
 
+@app.post("/process/stream")
+async def process_message_stream(request: ChatRequest):
+    """Process a chat message, streaming the reply as server-sent events.
+
+    Emits assistant_delta and tool_call_started events as the model produces them,
+    then a final event carrying the same response and view_change as /process.
+    """
+    events = asyncio.Queue()
+    session = sessions.get(request.session_id)
+
+    async def run():
+        final = {"type": "final", "session_id": session.id}
+        try:
+            async with session.lock:
+                direct = await _direct_answer(request.message, session)
+                if direct is not None:
+                    await events.put({**final, "response": direct["response"], "view_change": direct["view_change"]})
+                    return
+                result = await run_task(request.message, on_event=events.put, session=session)
+            await events.put({**final, "response": result, "view_change": detect_view(request.message, result)})
+        except Exception as e:
+            await events.put({**final, "response": f"Sorry, I encountered an error: {str(e)}", "view_change": None})
+        finally:
+            await events.put(None)
+
+    task = asyncio.create_task(run())
+
+    async def stream():
+        try:
+            while (event := await events.get()) is not None:
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        finally:
+            # Client went away mid-stream; stop the work it was waiting on
+            task.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @app.get("/health")
 def health():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "http_pool": connection_stats(),
+        "publisher": publisher.stats(),
+        "response_cache": get_response_cache().stats(),
+        "sessions": sessions.stats(),
+    }
+
+
+@app.get("/schedules")
+def schedules():
+    """Scheduled workflows with their next slot and recent runs; full history is in /workflows."""
+    return {"enabled": AGENT_SCHEDULER_ENABLED, **scheduler.status()}
 
 
 if __name__ == "__main__":
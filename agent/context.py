@@ -0,0 +1,201 @@
+# ABOUTME: Token-budgeted conversation context for one agent task
+# ABOUTME: Compacts large tool results into tables, keeps full results retrievable by reference and enforces prompt budgets
+import contextvars
+import json
+import os
+
+# Most prompt tokens one model call may carry; older tool results are elided to stay under it
+AGENT_CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "16000"))
+# Prompt tokens a whole task may spend across its model calls before it is stopped
+AGENT_TASK_TOKEN_BUDGET = int(os.getenv("AGENT_TASK_TOKEN_BUDGET", "120000"))
+# A tool result larger than this is compacted before it enters the conversation
+AGENT_TOOL_RESULT_TOKENS = int(os.getenv("AGENT_TOOL_RESULT_TOKENS", "1500"))
+
+# Most list items one tool_get_tool_result page returns
+_MAX_PAGE = 100
+# Row counts tried, largest first, when a compacted result must shrink further
+_TABLE_ROWS = (25, 10, 5, 2)
+_MAX_CELL_CHARS = 80
+# Per-message framing the chat format adds on top of the content
+_MESSAGE_OVERHEAD = 4
+
+_current = contextvars.ContextVar("task_context", default=None)
+
+
+def _load_encoding():
+    # Exact counts need the optional `tiktoken` package; otherwise ~4 characters per token
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+
+_encoding = _load_encoding()
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    tokens = _MESSAGE_OVERHEAD + count_tokens(message.get("content") or "")
+    for call in message.get("tool_calls") or []:
+        tokens += count_tokens(call["function"]["name"]) + count_tokens(call["function"]["arguments"])
+    return tokens
+
+
+def _dump(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        text = _dump(value)
+        return text if len(text) <= _MAX_CELL_CHARS else text[:_MAX_CELL_CHARS] + "…"
+    if isinstance(value, str) and len(value) > _MAX_CELL_CHARS:
+        return value[:_MAX_CELL_CHARS] + "…"
+    return value
+
+
+def _shrink(value, rows: int):
+    """Tabular form of a result keeping at most `rows` items of every list."""
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            columns = list(dict.fromkeys(key for item in value for key in item))
+            table = {"columns": columns, "rows": [[_cell(item.get(c)) for c in columns] for item in value[:rows]]}
+        else:
+            table = {"items": [_shrink(item, rows) for item in value[:rows]]}
+        table["total"] = len(value)
+        return table
+    if isinstance(value, dict):
+        return {key: _shrink(item, rows) for key, item in value.items()}
+    return _cell(value)
+
+
+def compact_result(result, max_tokens: int, ref: str) -> str:
+    """Serialize `result` within max_tokens, tabulating and truncating lists as needed."""
+    for rows in _TABLE_ROWS:
+        text = _dump({"ref": ref, "compacted": True, "data": _shrink(result, rows)})
+        if count_tokens(text) <= max_tokens:
+            return text
+    preview = _dump(_shrink(result, 1))[: max_tokens * 3]
+    return _dump({"ref": ref, "compacted": True, "preview": preview})
+
+
+def _shape(result) -> str:
+    if isinstance(result, list):
+        return f"{len(result)} items"
+    if isinstance(result, dict):
+        return "object with keys " + ", ".join(list(result)[:12])
+    return type(result).__name__
+
+
+class TaskContext:
+    def __init__(
+        self,
+        budget: int = AGENT_CONTEXT_TOKEN_BUDGET,
+        task_budget: int = AGENT_TASK_TOKEN_BUDGET,
+        tool_result_tokens: int = AGENT_TOOL_RESULT_TOKENS,
+    ):
+        self.budget = budget
+        self.task_budget = task_budget
+        self.tool_result_tokens = tool_result_tokens
+        # ref -> full tool result, for tool_get_tool_result
+        self.results = {}
+        self._next_ref = 1
+        self._refs = {}
+        # tool_call_ids whose result has already been replaced by a stub
+        self._elided = set()
+        self.prompt_tokens = 0
+        self.stats = {"tool_results": 0, "compacted": 0, "elided": 0, "tokens_saved": 0, "peak_prompt_tokens": 0}
+
+    def tool_message(self, tool_call_id: str, result, compact: bool = True) -> dict:
+        """Conversation message for a tool result, compacted when it is over the per-result limit."""
+        ref = f"r{self._next_ref}"
+        self._next_ref += 1
+        self.results[ref] = result
+        self._refs[tool_call_id] = ref
+        self.stats["tool_results"] += 1
+
+        content = _dump(result)
+        full_tokens = count_tokens(content)
+        if compact and full_tokens > self.tool_result_tokens:
+            content = compact_result(result, self.tool_result_tokens, ref)
+            self.stats["compacted"] += 1
+            self.stats["tokens_saved"] += full_tokens - count_tokens(content)
+        return {"role": "tool", "tool_call_id": tool_call_id, "content": content}
+
+    def fit(self, messages: list) -> int:
+        """Elide older tool results, oldest first, until the prompt fits the budget.
+
+        Results of the latest tool round are kept since the model has not read them yet.
+        Returns the prompt's token count and charges it to the task budget.
+        """
+        sizes = [message_tokens(m) for m in messages]
+        total = sum(sizes)
+        latest = max((i for i, m in enumerate(messages) if m["role"] == "assistant"), default=len(messages))
+        for i in range(latest):
+            if total <= self.budget:
+                break
+            message = messages[i]
+            call_id = message.get("tool_call_id")
+            if message["role"] != "tool" or call_id not in self._refs or call_id in self._elided:
+                continue
+            ref = self._refs[call_id]
+            message["content"] = _dump({"ref": ref, "elided": True, "shape": _shape(self.results[ref])})
+            self._elided.add(call_id)
+            size = message_tokens(message)
+            self.stats["elided"] += 1
+            self.stats["tokens_saved"] += sizes[i] - size
+            total -= sizes[i] - size
+        self.prompt_tokens += total
+        self.stats["peak_prompt_tokens"] = max(self.stats["peak_prompt_tokens"], total)
+        return total
+
+    def start_task(self):
+        """Reset the task budget; a session reuses one context across its tasks."""
+        self.prompt_tokens = 0
+
+    def forget(self, tool_call_ids):
+        """Release the full results of tool messages that left the conversation."""
+        for call_id in tool_call_ids:
+            self.results.pop(self._refs.pop(call_id, None), None)
+            self._elided.discard(call_id)
+
+    def over_task_budget(self) -> bool:
+        return self.prompt_tokens >= self.task_budget
+
+    def report(self) -> dict:
+        return {**self.stats, "prompt_tokens": self.prompt_tokens, "budget": self.budget, "task_budget": self.task_budget}
+
+    def activate(self):
+        """Make this the context tool_get_tool_result reads from; returns a token for deactivate."""
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+async def get_tool_result(ref: str, field: str = None, offset: int = 0, limit: int = 25):
+    """Page through a full tool result that was compacted or elided from the conversation.
+
+    Pages are returned uncompacted, so `limit` is capped to keep one page a sensible size.
+    """
+    context = _current.get()
+    if context is None or ref not in context.results:
+        return {"error": f"Unknown result reference {ref}"}
+    result = context.results[ref]
+    if field is not None:
+        if not isinstance(result, dict) or field not in result:
+            return {"error": f"Result {ref} has no field {field}"}
+        result = result[field]
+    if isinstance(result, list):
+        limit = max(1, min(limit, _MAX_PAGE))
+        return {"ref": ref, "field": field, "offset": offset, "total": len(result), "items": result[offset:offset + limit]}
+    return {"ref": ref, "field": field, "value": result}
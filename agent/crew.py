@@ -2,92 +2,230 @@
 # ABOUTME: Handles OpenAI function calling loop and tool execution
 import json
 import asyncio
+import functools
 import sys
 import os
-import websockets
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agent.openai_client import client, tools
-from agent.tools import (
-    search_customers,
-    list_tickets,
-    create_note,
-    send_email,
-    emit_intent,
-    get_customer_stats,
-    bulk_update_tickets,
-    generate_report,
-    execute_workflow,
-    workflow_decision,
-    set_workflow_state,
-    get_workflow_state,
-    create_customer,
-    schedule_followup,
-    check_sla_status,
-    assign_ticket,
-    create_visualization,
-)
-
-
-AGENT_WS = os.getenv("AGENT_WS", "ws://localhost:8765")
+from agent.openai_client import MODEL_TIMEOUT, get_model_client, tools
+from agent.publisher import publisher
+from agent.response_cache import get_response_cache, request_key
+from agent.sessions import Session
+from agent.context import TaskContext
+from agent.tool_cache import ToolCache
+from agent.tool_registry import TOOLS, is_cacheable, is_raw_result, is_read_only
+from agent.tool_router import ToolRouter
+
+AGENT_TOOL_THREADS = int(os.getenv("AGENT_TOOL_THREADS", "4"))
+
+MODEL = "openrouter/openai/gpt-4o"
+
+# Sync tools are CPU-only; running them here keeps them off the event loop
+_tool_executor = ThreadPoolExecutor(max_workers=AGENT_TOOL_THREADS, thread_name_prefix="agent-tool")
+
+
+async def _run_sync(fn, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_tool_executor, functools.partial(fn, **kwargs))
 
 
 async def emit_log(log: dict):
-    """Send structured log events to the frontend via WebSocket."""
-    try:
-        async with websockets.connect(AGENT_WS) as ws:
-            await ws.send(json.dumps(log))
-    except Exception as e:
-        print(f"Failed to emit log: {e}")
+    """Send structured log events to the frontend; logs are dropped rather than stall the agent."""
+    await publisher.publish(log, droppable=True)
 
 
 
 async def call_tool(name: str, args: dict):
     """Execute a tool function based on its name and arguments."""
-    # Handle async tools
-    if name == "tool_emit_view_intent":
-        return await emit_intent(args)
-    elif name == "tool_create_visualization":
-        return await create_visualization(**args)
-    
-    # Handle sync tools
-    elif name == "tool_search_customers":
-        return search_customers(**args)
-    elif name == "tool_list_tickets":
-        return list_tickets(**args)
-    elif name == "tool_create_note":
-        return create_note(**args)
-    elif name == "tool_send_email":
-        return send_email(**args)
-    elif name == "tool_get_customer_stats":
-        return get_customer_stats(**args)
-    elif name == "tool_bulk_update_tickets":
-        return bulk_update_tickets(**args)
-    elif name == "tool_generate_report":
-        return generate_report(**args)
-    elif name == "tool_execute_workflow":
-        return execute_workflow(**args)
-    elif name == "tool_workflow_decision":
-        return workflow_decision(**args)
-    elif name == "tool_set_workflow_state":
-        return set_workflow_state(**args)
-    elif name == "tool_get_workflow_state":
-        return get_workflow_state(**args)
-    elif name == "tool_create_customer":
-        return create_customer(**args)
-    elif name == "tool_schedule_followup":
-        return schedule_followup(**args)
-    elif name == "tool_check_sla_status":
-        return check_sla_status(**args)
-    elif name == "tool_assign_ticket":
-        return assign_ticket(**args)
-    else:
+    spec = TOOLS.get(name)
+    if spec is None:
         raise ValueError(f"Unknown tool {name}")
+    if spec.takes_args_dict:
+        return await spec.fn(args)
+    if spec.is_async:
+        return await spec.fn(**args)
+    # Sync tools run on the bounded thread pool
+    return await _run_sync(spec.fn, **args)
+
+
+async def _execute_tool_call(tool_call, cache: ToolCache = None, context: TaskContext = None) -> dict:
+    """Run one tool call and return the tool message to append to the conversation."""
+    tool_name = tool_call.function.name
+    args = json.loads(tool_call.function.arguments or "{}")
+
+    print(f"DEBUG: Calling tool {tool_name} with args: {args}")
+
+    try:
+        cached = False
+        if cache is not None and is_cacheable(tool_name):
+            cached, tool_result = cache.get(tool_name, args)
+        if not cached:
+            tool_result = await call_tool(tool_name, args)
+            if cache is not None:
+                if is_cacheable(tool_name):
+                    cache.put(tool_name, args, tool_result)
+                elif not is_read_only(tool_name):
+                    cache.invalidate(TOOLS[tool_name].invalidates)
+        await emit_log(
+            {
+                "type": "tool_call",
+                "name": tool_name,
+                "status": "success",
+                "cached": cached,
+                "result": tool_result,
+            }
+        )
+        if context is not None:
+            return context.tool_message(tool_call.id, tool_result, compact=not is_raw_result(tool_name))
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call.id,
+            "content": json.dumps(tool_result),
+        }
+    except Exception as e:
+        await emit_log(
+            {
+                "type": "tool_call",
+                "name": tool_name,
+                "status": "error",
+                "error": str(e),
+            }
+        )
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call.id,
+            "content": json.dumps({"error": str(e)}),
+        }
+
+
+async def execute_tool_calls(tool_calls, cache: ToolCache = None, context: TaskContext = None) -> list:
+    """Run one turn's tool calls, returning tool messages in the original call order.
+
+    Consecutive read-only calls run concurrently; a mutating call waits for
+    everything before it and runs alone, so mutations keep their order.
+    """
+    results = []
+    pending_reads = []
+    for tool_call in tool_calls:
+        if is_read_only(tool_call.function.name):
+            pending_reads.append(tool_call)
+            continue
+        if pending_reads:
+            results.extend(await asyncio.gather(*(_execute_tool_call(tc, cache, context) for tc in pending_reads)))
+            pending_reads = []
+        results.append(await _execute_tool_call(tool_call, cache, context))
+    if pending_reads:
+        results.extend(await asyncio.gather(*(_execute_tool_call(tc, cache, context) for tc in pending_reads)))
+    return results
+
+
+async def _emit_stream_event(event: dict, on_event=None):
+    """Forward a streaming event to the WebSocket channel and the caller's own sink."""
+    await emit_log(event)
+    if on_event is not None:
+        await on_event(event)
+
+
+async def _stream_completion(messages: list, task_id: str, emit, tool_schemas: list = tools) -> dict:
+    """Stream one model turn, forwarding text deltas and tool-call starts as they arrive.
+
+    Returns the assembled assistant message.
+    """
+    stream = await get_model_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        tools=tool_schemas,
+        tool_choice="auto",
+        temperature=0,
+        stream=True,
+        timeout=MODEL_TIMEOUT,
+    )
+    text = []
+    # Tool calls arrive as fragments keyed by their index in the turn
+    calls = {}
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                text.append(delta.content)
+                await emit({"type": "assistant_delta", "task_id": task_id, "text": delta.content})
+            for part in delta.tool_calls or []:
+                call = calls.setdefault(part.index, {"id": None, "name": "", "arguments": ""})
+                if part.id:
+                    call["id"] = part.id
+                if part.function is None:
+                    continue
+                if part.function.name:
+                    started = not call["name"]
+                    call["name"] += part.function.name
+                    if started:
+                        await emit({"type": "tool_call_started", "task_id": task_id, "id": call["id"], "name": call["name"]})
+                if part.function.arguments:
+                    call["arguments"] += part.function.arguments
+    finally:
+        # On cancellation this aborts the response and hands the connection back to the pool
+        await stream.close()
 
+    ordered = [calls[index] for index in sorted(calls)]
+    message = {"role": "assistant", "content": "".join(text) or None}
+    if ordered:
+        message["tool_calls"] = [
+            {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"]}}
+            for c in ordered
+        ]
+    return message
 
-async def run_task(user_goal: str) -> str:
-    """Execute a task using OpenAI function calling."""
+
+def _tool_calls(message: dict) -> list:
+    return [
+        SimpleNamespace(id=c["id"], function=SimpleNamespace(name=c["function"]["name"], arguments=c["function"]["arguments"]))
+        for c in message.get("tool_calls") or []
+    ]
+
+
+async def _complete(messages: list, task_id: str, emit, tool_schemas: list = tools):
+    """One model turn, replayed from the response cache when the identical request was answered before.
+
+    Returns the assistant message and its tool calls.
+    """
+    cache = get_response_cache()
+    if not cache.enabled:
+        message = await _stream_completion(messages, task_id, emit, tool_schemas)
+        return message, _tool_calls(message)
+
+    key = request_key(MODEL, messages, tool_schemas, tool_choice="auto", temperature=0)
+    message = await asyncio.to_thread(cache.get, key)
+    if message is not None:
+        # Replay the events a live stream would have sent
+        if message["content"]:
+            await emit({"type": "assistant_delta", "task_id": task_id, "text": message["content"], "cached": True})
+        for call in message.get("tool_calls") or []:
+            await emit({"type": "tool_call_started", "task_id": task_id, "id": call["id"], "name": call["function"]["name"], "cached": True})
+        return message, _tool_calls(message)
+
+    message = await _stream_completion(messages, task_id, emit, tool_schemas)
+    await asyncio.to_thread(cache.put, key, message)
+    return message, _tool_calls(message)
+
+
+def _tool_call_ids(messages: list) -> list:
+    return [m["tool_call_id"] for m in messages if m["role"] == "tool"]
+
+
+async def run_task(user_goal: str, on_event=None, session: Session = None) -> str:
+    """Execute a task using OpenAI function calling.
+
+    The model's reply is streamed: text deltas and tool-call starts go out over
+    the WebSocket as they arrive, and to `on_event` when given. With a session,
+    the task sees the session's earlier turns and reuses its cached lookups, and
+    the finished turn is added to the session.
+    """
     messages = [
         {
             "role": "system",
@@ -137,80 +275,83 @@ Always start by setting an appropriate view, then execute the requested task. Fo
         {"role": "user", "content": user_goal},
     ]
 
-    max_iterations = 10
-    iteration = 0
+    if session is None:
+        return (await _run_loop(messages, ToolCache(), TaskContext(), on_event))[0]
 
-    while iteration < max_iterations:
-        iteration += 1
+    # Prior turns sit between the system prompt and the new goal
+    messages[1:1] = session.history
+    turn_start = len(session.history) + 1
+    try:
+        result, completed = await _run_loop(messages, session.cache, session.context, on_event)
+    except BaseException:
+        # Nothing of a failed turn is kept, so neither are its tool results
+        session.context.forget(_tool_call_ids(messages[turn_start:]))
+        raise
+    if completed:
+        session.record(messages[turn_start:])
+    else:
+        # A cut-off turn may end in unanswered tool calls; keep only what the user saw
+        # and release the full results of the tool messages that are dropped
+        session.context.forget(_tool_call_ids(messages[turn_start:]))
+        session.record([messages[turn_start], {"role": "assistant", "content": result}])
+    return result
 
-        try:
-            response = client.chat.completions.create(
-                model="openrouter/openai/gpt-4o",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                temperature=0,
-            )
-
-            choice = response.choices[0]
-            messages.append(choice.message.model_dump())
+
+async def _run_loop(messages: list, cache: ToolCache, context: TaskContext, on_event=None):
+    """Run the model/tool loop over messages in place; returns (reply, whether the model finished)."""
+    context.start_task()
+    context_token = context.activate()
+    router = ToolRouter()
+    task_id = uuid.uuid4().hex[:12]
+    emit = functools.partial(_emit_stream_event, on_event=on_event)
+    try:
+        max_iterations = 10
+        iteration = 0
+
+        while iteration < max_iterations:
+            iteration += 1
+
+            try:
+                context.fit(messages)
+                if context.over_task_budget():
+                    return "Task stopped: it used up its token budget before finishing", False
+                # Results behind refs are only reachable through tool_get_tool_result
+                required = ("tool_get_tool_result",) if context.stats["compacted"] + context.stats["elided"] else ()
+                offered = router.select(messages, required)
+                message, tool_calls = await _complete(messages, task_id, emit, offered)
+                messages.append(message)
             
-            print(f"DEBUG: Agent response has tool_calls: {choice.message.tool_calls is not None}")
-            if choice.message.tool_calls:
-                print(f"DEBUG: Number of tool calls: {len(choice.message.tool_calls)}")
-
-            if choice.message.tool_calls:
-                for tool_call in choice.message.tool_calls:
-                    tool_name = tool_call.function.name
-                    args = json.loads(tool_call.function.arguments or "{}")
-                    
-                    print(f"DEBUG: Calling tool {tool_name} with args: {args}")
-
-                    try:
-                        tool_result = await call_tool(tool_name, args)
-                        await emit_log(
-                            {
-                                "type": "tool_call",
-                                "name": tool_name,
-                                "status": "success",
-                                "result": tool_result,
-                            }
-                        )
-                        messages.append(
-                            {
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": json.dumps(tool_result),
-                            }
-                        )
-                    except Exception as e:
-                        await emit_log(
-                            {
-                                "type": "tool_call",
-                                "name": tool_name,
-                                "status": "error",
-                                "error": str(e),
-                            }
-                        )
-                        messages.append(
-                            {
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": json.dumps({"error": str(e)}),
-                            }
-                        )
-                continue
+                print(f"DEBUG: Agent response has tool_calls: {bool(tool_calls)}")
+                if tool_calls:
+                    print(f"DEBUG: Number of tool calls: {len(tool_calls)}")
 
-            return choice.message.content or "Task completed"
+                if tool_calls:
+                    router.observe(tool_calls)
+                    messages.extend(await execute_tool_calls(tool_calls, cache, context))
+                    continue
 
-        except Exception as e:
-            return f"Error during task execution: {str(e)}"
+                await emit({"type": "assistant_done", "task_id": task_id})
+                return message["content"] or "Task completed", True
 
-    return "Task execution exceeded maximum iterations"
+            except Exception as e:
+                return f"Error during task execution: {str(e)}", False
 
+        return "Task execution exceeded maximum iterations", False
+    finally:
+        context.deactivate(context_token)
+        await emit_log({"type": "tool_cache", "stats": cache.stats()})
+        await emit_log({"type": "context", "stats": context.report()})
+        await emit_log({"type": "tool_router", "stats": router.report()})
 
 if __name__ == "__main__":
     task = "Show Acme's open tickets in a triage view; for the oldest one, add a follow-up note and email me a short summary."
     print("Starting task execution...")
-    result = asyncio.run(run_task(task))
+
+    async def main():
+        try:
+            return await run_task(task)
+        finally:
+            await publisher.drain()
+
+    result = asyncio.run(main())
     print(f"Task result: {result}")
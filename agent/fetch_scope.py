@@ -0,0 +1,87 @@
+# ABOUTME: Run-scoped sharing of GET responses for reports and read-heavy workflows
+# ABOUTME: Identical fetches within a scope share one in-flight request; per-fetch latency is measured against a budget
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+from urllib.parse import urlencode
+
+from agent.http_client import api_get
+
+# Target wall-clock time for gathering one report's data
+AGENT_REPORT_BUDGET_SECONDS = float(os.getenv("AGENT_REPORT_BUDGET_SECONDS", "3"))
+
+_current = contextvars.ContextVar("fetch_scope", default=None)
+
+
+class FetchScope:
+    def __init__(self, budget: float = AGENT_REPORT_BUDGET_SECONDS):
+        self.budget = budget
+        self.started = time.perf_counter()
+        # request key -> task resolving to the decoded JSON body
+        self._fetches = {}
+        self.timings_ms = {}
+        self.shared = 0
+
+    async def _fetch(self, key: str, path: str, params: dict, timeout: float):
+        started = time.perf_counter()
+        try:
+            response = await api_get(path, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        finally:
+            self.timings_ms[key] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def get_json(self, path: str, params: dict = None, timeout: float = 10):
+        key = f"{path}?{urlencode(sorted((params or {}).items()))}" if params else path
+        task = self._fetches.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, path, params, timeout))
+            self._fetches[key] = task
+        else:
+            self.shared += 1
+        # Shielded so one cancelled caller doesn't cancel the fetch for everyone sharing it
+        return await asyncio.shield(task)
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "total_ms": round(elapsed * 1000, 1),
+            "budget_ms": round(self.budget * 1000, 1),
+            "within_budget": elapsed <= self.budget,
+            "fetches": len(self._fetches),
+            "shared_fetches": self.shared,
+            "fetch_ms": dict(self.timings_ms),
+        }
+
+
+@contextlib.asynccontextmanager
+async def fetch_scope(budget: float = AGENT_REPORT_BUDGET_SECONDS):
+    """Open a scope, or join the enclosing one so nested reports share its fetches."""
+    scope = _current.get()
+    if scope is not None:
+        yield scope
+        return
+    scope = FetchScope(budget)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        report = scope.report()
+        if not report["within_budget"]:
+            print(f"Report data gathering over budget: {report['total_ms']}ms > {report['budget_ms']}ms")
+
+
+async def get_json(path: str, params: dict = None, timeout: float = 10):
+    """GET a JSON body, shared with identical fetches in the current scope.
+
+    Shared bodies are the same object for every caller, so treat them as read-only.
+    """
+    scope = _current.get()
+    if scope is None:
+        response = await api_get(path, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    return await scope.get_json(path, params, timeout)
@@ -0,0 +1,151 @@
+# ABOUTME: Process-wide pooled async HTTP client shared by all agent tools
+# ABOUTME: Keep-alive pooling, per-call timeouts, jittered retries for idempotent GETs and connection counters
+import asyncio
+import os
+import random
+import threading
+
+import httpx
+
+API_BASE = os.getenv("API_BASE", "http://localhost:8000")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AGENT_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("AGENT_HTTP_TIMEOUT", "10"))
+HTTP_GET_RETRIES = int(os.getenv("AGENT_HTTP_GET_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("AGENT_HTTP_RETRY_BACKOFF", "0.1"))
+# HTTP/2 needs the optional `h2` package; it is silently skipped when missing
+HTTP2 = os.getenv("AGENT_HTTP2", "0") == "1"
+
+stats = {"requests": 0, "connections_opened": 0, "retries": 0}
+
+_lock = threading.Lock()
+# An AsyncClient's pool is tied to the event loop it was first used on, so each loop gets its own
+_clients = {}
+
+
+def _count(key: str, n: int = 1):
+    with _lock:
+        stats[key] += n
+
+
+async def _trace(event_name: str, info: dict):
+    # httpcore only connects when no pooled connection is available
+    if event_name == "connection.connect_tcp.complete":
+        _count("connections_opened")
+
+
+async def _on_request(request: httpx.Request):
+    _count("requests")
+    request.extensions["trace"] = _trace
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _aclose(client):
+    return client.aclose()
+
+
+def retire_closed_loops(clients: dict, loop: asyncio.AbstractEventLoop, close=_aclose):
+    """Close, on `loop`, the clients whose own event loop has since been closed.
+
+    Call with the owning lock held; the closes run as background tasks.
+    """
+    for stale_loop in [l for l in clients if l is not loop and l.is_closed()]:
+        task = loop.create_task(close(clients.pop(stale_loop)))
+        # The dead loop's transports may refuse a clean close; the sockets are released either way
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def close_loop_clients(clients: dict, lock: threading.Lock, close=_aclose):
+    """Close every client in `clients`: in place for this loop, on their own loop for live ones."""
+    loop = asyncio.get_running_loop()
+    with lock:
+        owned = list(clients.items())
+        clients.clear()
+    for owner, client in owned:
+        try:
+            if owner is loop or owner.is_closed():
+                await close(client)
+            else:
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(close(client), owner))
+        except Exception as e:
+            print(f"Could not close HTTP client cleanly: {e}")
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None:
+            retire_closed_loops(_clients, loop)
+            client = _clients[loop] = httpx.AsyncClient(
+                base_url=API_BASE,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=HTTP2 and _http2_available(),
+                timeout=HTTP_TIMEOUT,
+                event_hooks={"request": [_on_request]},
+            )
+        return client
+
+
+async def close_client():
+    await close_loop_clients(_clients, _lock)
+
+
+async def _backoff(attempt: int):
+    # Full jitter keeps concurrent retries from hitting the backend in lockstep
+    await asyncio.sleep(random.uniform(0, HTTP_RETRY_BACKOFF * 2**attempt))
+
+
+async def api_request(method: str, path: str, timeout: float = None, retries: int = None, **kwargs) -> httpx.Response:
+    """Send a request through the shared pool.
+
+    GETs are idempotent and retried on transport errors and 5xx responses;
+    other methods are sent exactly once.
+    """
+    client = get_client()
+    attempts = 1
+    if method == "GET":
+        attempts += HTTP_GET_RETRIES if retries is None else retries
+
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        try:
+            response = await client.request(method, path, timeout=timeout or HTTP_TIMEOUT, **kwargs)
+        except httpx.TransportError:
+            if last:
+                raise
+        else:
+            if response.status_code < 500 or last:
+                return response
+        _count("retries")
+        await _backoff(attempt)
+
+
+async def api_get(path: str, **kwargs) -> httpx.Response:
+    return await api_request("GET", path, **kwargs)
+
+
+async def api_post(path: str, **kwargs) -> httpx.Response:
+    return await api_request("POST", path, **kwargs)
+
+
+def connection_stats() -> dict:
+    """Snapshot of pool usage; every request that did not open a connection reused one."""
+    with _lock:
+        snapshot = dict(stats)
+    snapshot["connections_reused"] = max(0, snapshot["requests"] - snapshot["connections_opened"])
+    return snapshot
@@ -0,0 +1,202 @@
+# ABOUTME: Compiled intent rules for chat messages: view detection and a fast path that skips the model
+# ABOUTME: Pure navigation and simple customer/ticket lookups are answered directly; anything else goes to run_task
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from agent.openai_client import tools
+from agent.tools import PLAN_TYPES, REGION_ALIASES, criteria_filters, emit_intent, list_tickets, search_customers
+
+AGENT_INTENT_FAST_PATH = os.getenv("AGENT_INTENT_FAST_PATH", "1") == "1"
+# Intents below this confidence are left to the model
+AGENT_INTENT_MIN_CONFIDENCE = float(os.getenv("AGENT_INTENT_MIN_CONFIDENCE", "0.9"))
+
+# Names listed in a lookup answer before it says "and N more"
+_LIST_LIMIT = 10
+
+
+def _view_enum() -> tuple:
+    for schema in tools:
+        if schema["function"]["name"] == "tool_emit_view_intent":
+            return tuple(schema["function"]["parameters"]["properties"]["view_id"]["enum"])
+    raise RuntimeError("tool_emit_view_intent schema is missing its view enum")
+
+
+VIEWS = _view_enum()
+
+
+def _any(*words) -> re.Pattern:
+    return re.compile("|".join(re.escape(word) for word in words))
+
+
+# Keyword rules for the view that best fits a message, first match wins. Each rule is a
+# list of clauses; a clause matches when every one of its word groups occurs in the message.
+VIEW_RULES = (
+    ("workflow", [(_any("workflow"),), (_any("onboard"),), (_any("escalation"),), (_any("run", "execute"), _any("workflow", "process"))]),
+    ("triage", [(_any("triage"),), (_any("ticket"), _any("show", "view", "display"))]),
+    ("analytics", [(_any("analytics", "report", "stats"),)]),
+    ("dashboard", [(_any("dashboard", "summary", "overview"),)]),
+    ("customer-list", [(_any("customer"), _any("list", "show", "browse"))]),
+    ("timeline", [(_any("timeline"),)]),
+    ("calendar", [(_any("calendar"),)]),
+)
+
+
+def view_for_message(message: str) -> Optional[str]:
+    """View suggested by the message's keywords, if any."""
+    text = message.lower()
+    for view, clauses in VIEW_RULES:
+        if any(all(group.search(text) for group in clause) for clause in clauses):
+            return view
+    return None
+
+
+def view_from_response(result: str) -> Optional[str]:
+    """View the agent named explicitly with a "view:" marker in its reply."""
+    parts = result.lower().split("view:")
+    if len(parts) > 1 and parts[1].split():
+        return parts[1].split()[0].strip()
+    return None
+
+
+def detect_view(message: str, result: str) -> Optional[str]:
+    """Pick the UI view to switch to from the user's message and the agent's reply."""
+    return view_from_response(result) or view_for_message(message)
+
+
+# Words users call each view by; customer-detail needs a customer, so it is not a navigation target
+_VIEW_ALIASES = {
+    "customer-list": ("customer list", "customers", "customer-list"),
+    "triage": ("triage", "tickets", "ticket queue", "support queue"),
+    "dashboard": ("dashboard", "overview", "home"),
+    "analytics": ("analytics", "stats", "statistics", "reports", "metrics"),
+    "timeline": ("timeline", "activity"),
+    "calendar": ("calendar", "schedule"),
+    "workflow": ("workflow", "workflows"),
+}
+_ALIAS_TO_VIEW = {alias: view for view, aliases in _VIEW_ALIASES.items() if view in VIEWS for alias in aliases}
+
+_LEAD = r"^(?:please\s+)?(?:(?:can|could)\s+you\s+)?"
+_VERB = r"(?:show|open|display|go\s+to|switch\s+to|take\s+me\s+to|navigate\s+to|bring\s+up)"
+_TAIL = r"\s*(?:please)?\s*[.!?]?$"
+
+_NAVIGATE = re.compile(
+    _LEAD + _VERB + r"\s+(?:me\s+)?(?:the\s+)?(?P<view>"
+    + "|".join(sorted((re.escape(a) for a in _ALIAS_TO_VIEW), key=len, reverse=True))
+    + r")(?:\s+(?:view|page|screen|tab))?" + _TAIL
+)
+_LIST_CUSTOMERS = re.compile(
+    _LEAD + r"(?:show|list|find)\s+(?:me\s+)?(?:all\s+)?(?:the\s+)?(?:our\s+)?"
+    r"(?:(?P<plan>[a-z]+)\s+)?customers"
+    r"(?:\s+(?:in|from)\s+(?P<location>[a-z][a-z ]*?))?" + _TAIL
+)
+_LIST_TICKETS = re.compile(
+    _LEAD + r"(?:show|list)\s+(?:me\s+)?(?:the\s+)?(?:(?P<status>open|closed|resolved)\s+)?tickets\s+(?:for|of)\s+"
+    r"(?P<customer>[\w&.' -]+?)" + _TAIL,
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Intent:
+    kind: str
+    view: str
+    confidence: float
+    params: dict = field(default_factory=dict)
+
+
+def classify(message: str) -> Optional[Intent]:
+    """Match a message against the fast-path grammar; the whole message must be consumed."""
+    text = " ".join(message.split())
+    lowered = text.lower()
+    match = _NAVIGATE.match(lowered)
+    if match:
+        return Intent("navigate", _ALIAS_TO_VIEW[match["view"]], 1.0)
+    match = _LIST_CUSTOMERS.match(lowered)
+    if match:
+        params = {k: v.strip() for k, v in match.groupdict().items() if v}
+        return Intent("list_customers", "customer-list", 1.0, params)
+    match = _LIST_TICKETS.match(text)
+    if match:
+        # The customer still has to resolve to exactly one record before this is answerable
+        customer = match["customer"].strip().removesuffix("'s")
+        return Intent("list_tickets", "triage", 0.95, {"customer": customer, "status": (match["status"] or "open").lower()})
+    view = view_for_message(text)
+    if view:
+        return Intent("keyword", view, 0.5)
+    return None
+
+
+def _names(records: list, label) -> str:
+    shown = ", ".join(label(r) for r in records[:_LIST_LIMIT])
+    more = len(records) - _LIST_LIMIT
+    return f"{shown} and {more} more" if more > 0 else shown
+
+
+def _customer_filters(plan: str = None, location: str = None) -> Optional[dict]:
+    """search_customers filters for a plan word and location, or None when either is not a known value."""
+    filters = {}
+    if plan:
+        # Same mapping the search tool uses, so "trial" means the trial lifecycle stage
+        if plan not in PLAN_TYPES:
+            return None
+        filters.update(criteria_filters(plan))
+    if location:
+        region = next((r for r, aliases in REGION_ALIASES.items() if location in aliases), None)
+        if region is None:
+            return None
+        filters["region"] = region
+    return filters
+
+
+async def _answer(intent: Intent) -> Optional[str]:
+    if intent.kind == "navigate":
+        return f"Switched to the {intent.view} view."
+
+    if intent.kind == "list_customers":
+        filters = _customer_filters(intent.params.get("plan"), intent.params.get("location"))
+        if filters is None:
+            return None
+        customers = await search_customers(**filters)
+        scope = " ".join(filter(None, (intent.params.get("plan"), "customers")))
+        if "region" in filters:
+            scope += f" in {filters['region']}"
+        if not customers:
+            return f"No {scope} found."
+        return f"Found {len(customers)} {scope}: {_names(customers, lambda c: c['name'])}."
+
+    if intent.kind == "list_tickets":
+        matches = await search_customers(name=intent.params["customer"])
+        if len(matches) != 1:
+            return None
+        customer = matches[0]
+        tickets = await list_tickets(customer["id"], intent.params["status"])
+        status = intent.params["status"]
+        if not tickets:
+            return f"{customer['name']} has no {status} tickets."
+        listed = _names(tickets, lambda t: f"#{t['id']} {t['title']}")
+        return f"{customer['name']} has {len(tickets)} {status} tickets: {listed}."
+
+    return None
+
+
+async def answer_directly(message: str) -> Optional[dict]:
+    """Answer a message without the model when its intent is certain.
+
+    Returns {"response", "view_change", "intent"}, or None to fall back to run_task.
+    """
+    if not AGENT_INTENT_FAST_PATH:
+        return None
+    intent = classify(message)
+    if intent is None or intent.confidence < AGENT_INTENT_MIN_CONFIDENCE:
+        return None
+    try:
+        response = await _answer(intent)
+    except Exception as e:
+        print(f"Intent fast path fell back to the model: {e}")
+        return None
+    if response is None:
+        return None
+    await emit_intent({"type": "set_view", "view_id": intent.view})
+    return {"response": response, "view_change": intent.view, "intent": intent.kind}
@@ -0,0 +1,100 @@
+# ABOUTME: Bounded background job queue for workflows submitted over the WebSocket
+# ABOUTME: Worker pool with per-client token-bucket rate limits; submitters get a job id and progress notifications
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+AGENT_JOB_WORKERS = int(os.getenv("AGENT_JOB_WORKERS", "4"))
+AGENT_JOB_QUEUE_SIZE = int(os.getenv("AGENT_JOB_QUEUE_SIZE", "100"))
+# Sustained submissions allowed per client per minute, and how many may arrive at once
+AGENT_JOB_RATE_PER_MINUTE = float(os.getenv("AGENT_JOB_RATE_PER_MINUTE", "10"))
+AGENT_JOB_BURST = int(os.getenv("AGENT_JOB_BURST", "3"))
+
+# Finished jobs kept for status lookups
+_JOB_HISTORY = 500
+
+
+class RateLimiter:
+    """Token bucket per client."""
+
+    def __init__(self, rate_per_minute: float = AGENT_JOB_RATE_PER_MINUTE, burst: int = AGENT_JOB_BURST):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        # client -> (tokens, last refill)
+        self._buckets = {}
+
+    def allow(self, client) -> bool:
+        now = time.monotonic()
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return False
+        self._buckets[client] = (tokens - 1, now)
+        return True
+
+    def forget(self, client):
+        self._buckets.pop(client, None)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, workers: int = AGENT_JOB_WORKERS, max_pending: int = AGENT_JOB_QUEUE_SIZE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._worker_tasks = []
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            loop = asyncio.get_running_loop()
+            self._worker_tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(self, name: str, run, notify) -> dict:
+        """Queue `run(progress)` and return its job record; raises JobQueueFull when at capacity.
+
+        `notify(message)` is awaited with job events and must not raise.
+        """
+        self._ensure_started()
+        job = {"id": uuid.uuid4().hex[:12], "name": name, "status": "queued", "submitted_at": time.time()}
+        try:
+            self._queue.put_nowait((job, run, notify))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"{self.max_pending} jobs already pending")
+        self.jobs[job["id"]] = job
+        while len(self.jobs) > _JOB_HISTORY:
+            self.jobs.popitem(last=False)
+        return {**job, "position": self._queue.qsize()}
+
+    async def _work(self):
+        while True:
+            job, run, notify = await self._queue.get()
+            job["status"] = "running"
+            await notify({"type": "job_started", "job_id": job["id"], "name": job["name"]})
+
+            async def progress(event: dict, job_id=job["id"]):
+                await notify({"type": "job_progress", "job_id": job_id, **event})
+
+            try:
+                result = await run(progress)
+                job["status"] = "failed" if result.get("status") == "error" or result.get("error") else "completed"
+                await notify({"type": f"job_{job['status']}", "job_id": job["id"], "result": result})
+            except Exception as e:
+                job["status"] = "failed"
+                await notify({"type": "job_failed", "job_id": job["id"], "error": str(e)})
+            finally:
+                job["finished_at"] = time.time()
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"pending": self._queue.qsize() if self._queue else 0, "workers": self.workers, "jobs": counts}
@@ -1,12 +1,56 @@
 # ABOUTME: OpenAI client configuration with function calling tool schemas
 # ABOUTME: Defines structured tool definitions for the agent's capabilities
-from openai import OpenAI
+from openai import AsyncOpenAI
+import asyncio
 import os
+import threading
+
+import httpx
+
+from agent.http_client import close_loop_clients, retire_closed_loops
+
+MODEL_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://litellm.platform.datadrivet.ai")
+MODEL_MAX_CONNECTIONS = int(os.getenv("AGENT_MODEL_MAX_CONNECTIONS", "20"))
+MODEL_MAX_KEEPALIVE = int(os.getenv("AGENT_MODEL_MAX_KEEPALIVE", "10"))
+# Connect/read timeout for one model call; a streamed call resets it on every chunk
+MODEL_TIMEOUT = float(os.getenv("AGENT_MODEL_TIMEOUT", "60"))
+MODEL_MAX_RETRIES = int(os.getenv("AGENT_MODEL_MAX_RETRIES", "2"))
+
+_lock = threading.Lock()
+# The underlying httpx pool is tied to the event loop it was first used on, so each loop gets its own
+_clients = {}
+
+
+def _close(client: AsyncOpenAI):
+    return client.close()
+
+
+def get_model_client() -> AsyncOpenAI:
+    """Return the pooled async model client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None:
+            retire_closed_loops(_clients, loop, close=_close)
+            client = _clients[loop] = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=MODEL_BASE_URL,
+                timeout=MODEL_TIMEOUT,
+                max_retries=MODEL_MAX_RETRIES,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=MODEL_MAX_CONNECTIONS,
+                        max_keepalive_connections=MODEL_MAX_KEEPALIVE,
+                    ),
+                    timeout=MODEL_TIMEOUT,
+                ),
+            )
+        return client
+
+
+async def close_model_client():
+    await close_loop_clients(_clients, _lock, close=_close)
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://litellm.platform.datadrivet.ai",
-)
 
 tools = [
     {
@@ -19,7 +63,16 @@ tools = [
                 "properties": {
                     "name": {"type": "string"},
                     "location": {"type": "string"},
-                    "criteria": {"type": "string"}
+                    "criteria": {"type": "string"},
+                    "region": {"type": "string", "enum": ["North America", "Europe", "Asia Pacific"]},
+                    "industry": {"type": "string"},
+                    "plan_type": {"type": "string", "enum": ["starter", "professional", "premium", "enterprise", "trial"]},
+                    "lifecycle_stage": {"type": "string", "enum": ["prospect", "trial", "customer", "at_risk", "churn_risk"]},
+                    "min_health": {"type": "integer"},
+                    "max_health": {"type": "integer"},
+                    "min_mrr": {"type": "number"},
+                    "max_mrr": {"type": "number"},
+                    "min_open_tickets": {"type": "integer"}
                 },
                 "required": [],
             },
@@ -151,7 +204,7 @@ tools = [
         "type": "function",
         "function": {
             "name": "tool_execute_workflow",
-            "description": "Execute a predefined multi-step workflow with decision points.",
+            "description": "Execute a predefined multi-step workflow with decision points. Pass run_id to resume an interrupted run from its last completed step.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -159,7 +212,8 @@ tools = [
                         "type": "string",
                         "enum": ["customer_onboarding", "ticket_escalation", "weekly_report", "customer_health_check"]
                     },
-                    "context": {"type": "object"}
+                    "context": {"type": "object"},
+                    "run_id": {"type": "integer", "description": "Id of an earlier run to resume"}
                 },
                 "required": ["workflow_name"],
             },
@@ -185,12 +239,14 @@ tools = [
         "type": "function",
         "function": {
             "name": "tool_set_workflow_state",
-            "description": "Store workflow state data for multi-step processes.",
+            "description": "Store workflow state data for multi-step processes. State persists across restarts and expires after a TTL.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "key": {"type": "string"},
-                    "value": {"type": "object"}
+                    "value": {"type": "object"},
+                    "namespace": {"type": "string", "description": "Scope for the key, e.g. a workflow run or session id (default: global)"},
+                    "ttl_seconds": {"type": "number", "description": "How long to keep the value; 0 keeps it until overwritten"}
                 },
                 "required": ["key", "value"],
             },
@@ -204,12 +260,30 @@ tools = [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "key": {"type": "string"}
+                    "key": {"type": "string"},
+                    "namespace": {"type": "string", "description": "Scope the key was stored under (default: global)"}
                 },
                 "required": ["key"],
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "tool_get_tool_result",
+            "description": "Read the full data behind an earlier tool result that was compacted or elided (it carries a \"ref\" such as \"r3\"). Lists are returned a page at a time.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ref": {"type": "string", "description": "The ref from the compacted result"},
+                    "field": {"type": "string", "description": "Top-level field to read when the result is an object"},
+                    "offset": {"type": "integer", "default": 0},
+                    "limit": {"type": "integer", "default": 25, "maximum": 100}
+                },
+                "required": ["ref"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -266,7 +340,7 @@ tools = [
                 "type": "object",
                 "properties": {
                     "ticket_id": {"type": "string"},
-                    "assignee": {"type": "string", "enum": ["support_team", "senior_support", "manager", "technical_lead"]}
+                    "assignee": {"type": "string", "description": "Team member id (e.g. tm_2), name, or role such as Senior Support"}
                 },
                 "required": ["ticket_id", "assignee"],
             },
@@ -296,6 +370,24 @@ tools = [
                     "description": {
                         "type": "string",
                         "description": "Brief description of what the chart shows"
+                    },
+                    "spec": {
+                        "type": "object",
+                        "description": "Optional explicit chart spec. Use either dimension or time_bucket.",
+                        "properties": {
+                            "entity": {"type": "string", "enum": ["tickets", "customers", "interactions"]},
+                            "measure": {
+                                "type": "string",
+                                "enum": ["count", "open", "sla_breaches", "avg_satisfaction", "mrr", "avg_mrr", "avg_health"]
+                            },
+                            "dimension": {
+                                "type": "string",
+                                "enum": ["customer", "status", "priority", "category", "assignee", "region", "industry", "plan_type", "lifecycle_stage", "company_size", "health_band", "type", "author"]
+                            },
+                            "time_bucket": {"type": "string", "enum": ["day", "week", "month"]},
+                            "filters": {"type": "object", "description": "Dimension name to a value or list of values"},
+                            "top_k": {"type": "integer"}
+                        }
                     }
                 },
                 "required": ["chart_type", "data_query"],
@@ -0,0 +1,144 @@
+# ABOUTME: Long-lived WebSocket publisher shared by every intent and log sent from the agent process
+# ABOUTME: Bounded outbound queue with backpressure, auto-reconnect and batching of bursty messages
+import asyncio
+import json
+import os
+import random
+
+import websockets
+
+AGENT_WS = os.getenv("AGENT_WS", "ws://localhost:8765")
+# Shared secret the WebSocket server checks before relaying this process's messages
+AGENT_WS_TOKEN = os.getenv("AGENT_WS_TOKEN", "")
+
+PUBLISHER_QUEUE_SIZE = int(os.getenv("AGENT_PUBLISHER_QUEUE_SIZE", "1000"))
+PUBLISHER_BATCH_MAX = int(os.getenv("AGENT_PUBLISHER_BATCH_MAX", "50"))
+# How long to hold the first message of a burst waiting for more to batch with it
+PUBLISHER_BATCH_WINDOW = float(os.getenv("AGENT_PUBLISHER_BATCH_WINDOW", "0.01"))
+# How long a non-droppable publish waits for queue space before giving up
+PUBLISHER_PUT_TIMEOUT = float(os.getenv("AGENT_PUBLISHER_PUT_TIMEOUT", "2"))
+# How long shutdown waits for queued messages to go out
+PUBLISHER_DRAIN_TIMEOUT = float(os.getenv("AGENT_PUBLISHER_DRAIN_TIMEOUT", "5"))
+PUBLISHER_MAX_BACKOFF = 10.0
+
+
+class Publisher:
+    def __init__(self, url: str = AGENT_WS):
+        self.url = url
+        self.metrics = {"queued": 0, "sent": 0, "dropped": 0, "frames": 0, "reconnects": 0, "send_failures": 0}
+        # Whether the server is reachable right now, and why it was not the last time it failed
+        self.connected = False
+        self.last_error = None
+        self._queue = None
+        self._task = None
+        self._loop = None
+        # Messages taken off the queue whose send failed; retried first after reconnecting
+        self._unsent = []
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=PUBLISHER_QUEUE_SIZE)
+            self._loop = loop
+            # A batch left over from an earlier loop goes out first on this one
+            for message in self._unsent:
+                self._queue.put_nowait(message)
+            self._unsent = []
+            self._task = loop.create_task(self._run())
+
+    async def publish(self, message: dict, droppable: bool = False) -> bool:
+        """Queue a message for delivery.
+
+        Droppable messages (logs) are discarded when the queue is full; others
+        wait up to PUBLISHER_PUT_TIMEOUT for space, slowing the producer down to
+        the rate the server can take.
+        """
+        self._ensure_started()
+        try:
+            if droppable:
+                self._queue.put_nowait(message)
+            else:
+                await asyncio.wait_for(self._queue.put(message), PUBLISHER_PUT_TIMEOUT)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.metrics["dropped"] += 1
+            return False
+        self.metrics["queued"] += 1
+        return True
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + PUBLISHER_BATCH_WINDOW
+        while len(batch) < PUBLISHER_BATCH_MAX:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send(self, ws, batch: list):
+        frame = batch[0] if len(batch) == 1 else {"type": "batch", "messages": batch}
+        await ws.send(json.dumps(frame))
+        self.metrics["sent"] += len(batch)
+        self.metrics["frames"] += 1
+        for _ in batch:
+            self._queue.task_done()
+
+    async def _run(self):
+        backoff = 0.5
+        while True:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    # Identify as the agent; the server relays only publisher traffic to the UI
+                    await ws.send(json.dumps({"type": "hello", "role": "agent", "token": AGENT_WS_TOKEN}))
+                    self.connected = True
+                    self.last_error = None
+                    backoff = 0.5
+                    while True:
+                        batch = self._unsent or await self._next_batch()
+                        self._unsent = batch
+                        await self._send(ws, batch)
+                        self._unsent = []
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Publisher connection lost: {e}")
+                self.connected = False
+                self.last_error = str(e)
+                self.metrics["send_failures"] += 1
+                self.metrics["reconnects"] += 1
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+                backoff = min(backoff * 2, PUBLISHER_MAX_BACKOFF)
+
+    async def drain(self, timeout: float = PUBLISHER_DRAIN_TIMEOUT) -> bool:
+        """Wait until every queued or retrying message has been sent; False when timeout ran out first.
+
+        Call before the event loop closes, since closing it cancels the sender.
+        """
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return self._queue is None or (self._queue.empty() and not self._unsent)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Publisher drain timed out with {self._queue.qsize() + len(self._unsent)} messages unsent")
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "connected": self.connected,
+            "last_error": self.last_error,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "unsent": len(self._unsent),
+        }
+
+
+publisher = Publisher()
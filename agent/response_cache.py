@@ -0,0 +1,150 @@
+# ABOUTME: On-disk cache of model completions keyed by a hash of the full request
+# ABOUTME: Replays deterministic (temperature 0) responses with TTL, size-bounded LRU eviction and hit-rate metrics
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+AGENT_RESPONSE_CACHE_ENABLED = os.getenv("AGENT_RESPONSE_CACHE", "1") == "1"
+AGENT_RESPONSE_CACHE_DB = os.getenv("AGENT_RESPONSE_CACHE_DB", "agent/response_cache.sqlite3")
+AGENT_RESPONSE_CACHE_TTL = float(os.getenv("AGENT_RESPONSE_CACHE_TTL", str(24 * 3600)))
+AGENT_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("AGENT_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Size is checked every this many stores; eviction then trims to this share of the cap
+_EVICT_EVERY_WRITES = 50
+_EVICT_TO = 0.9
+
+
+def request_key(model: str, messages: list, tools: list, **params) -> str:
+    """Hash of everything that determines a completion; equal requests get equal keys."""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "tools": tools, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = AGENT_RESPONSE_CACHE_DB,
+        ttl: float = AGENT_RESPONSE_CACHE_TTL,
+        max_bytes: int = AGENT_RESPONSE_CACHE_MAX_BYTES,
+        enabled: bool = AGENT_RESPONSE_CACHE_ENABLED,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._conn = None
+        if not enabled:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS model_responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_model_responses_used ON model_responses(used_at)")
+        self._conn.execute("DELETE FROM model_responses WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: str):
+        """Cached assistant message for a request key, or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM model_responses WHERE key=? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE model_responses SET used_at=? WHERE key=?", (now, key))
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, message: dict):
+        if not self.enabled:
+            return
+        blob = zlib.compress(json.dumps(message, separators=(",", ":")).encode())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO model_responses(key, value, size, expires_at, used_at) VALUES(?,?,?,?,?)",
+                (key, blob, len(blob), now + self.ttl, now),
+            )
+            self.stores += 1
+            self._writes += 1
+            if self._writes % _EVICT_EVERY_WRITES == 0:
+                self._evict_locked(now)
+
+    def _evict_locked(self, now: float):
+        self._conn.execute("DELETE FROM model_responses WHERE expires_at <= ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM model_responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * _EVICT_TO)
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM model_responses ORDER BY used_at"):
+            if excess <= 0:
+                break
+            stale.append((key,))
+            excess -= size
+        self._conn.executemany("DELETE FROM model_responses WHERE key=?", stale)
+        self.evictions += len(stale)
+
+    def clear(self):
+        if self.enabled:
+            with self._lock:
+                self._conn.execute("DELETE FROM model_responses")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+        if self.enabled:
+            with self._lock:
+                entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM model_responses").fetchone()
+            stats.update(entries=entries, bytes=size)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,207 @@
+# ABOUTME: In-process scheduler that runs registered workflows on cron-like schedules
+# ABOUTME: Bounded worker pool, per-job concurrency caps, jitter and catch-up of missed runs; history lives in workflow_runs
+import asyncio
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from agent.http_client import api_get
+from agent.workflows import execute_workflow
+
+AGENT_SCHEDULER_ENABLED = os.getenv("AGENT_SCHEDULER_ENABLED", "1") == "1"
+AGENT_SCHEDULER_WORKERS = int(os.getenv("AGENT_SCHEDULER_WORKERS", "2"))
+# Longest the loop sleeps between checks, so clock jumps are noticed
+_MAX_SLEEP_SECONDS = 60
+
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _parse_field(field: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in field.split(","):
+        body, _, step = part.partition("/")
+        if body == "*":
+            start, end = low, high
+        elif "-" in body:
+            start, end = (int(v) for v in body.split("-", 1))
+        else:
+            start = end = int(body)
+            if step:
+                end = high
+        if not (low <= start <= end <= high):
+            raise ValueError(f"Cron field '{field}' out of range {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+class Cron:
+    """Standard five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday)."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELD_RANGES)
+        )
+        # Like cron, when both day fields are restricted a match on either is enough
+        self._any_day = fields[2] == "*" or fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        return (day_ok and weekday_ok) if self._any_day else (day_ok or weekday_ok)
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: '{self.expression}'")
+
+    def latest_at_or_before(self, moment: datetime, horizon: timedelta) -> datetime:
+        """Most recent matching minute within `horizon` before `moment`, or None."""
+        latest = None
+        candidate = self.next_after(moment - horizon)
+        while candidate <= moment:
+            latest = candidate
+            candidate = self.next_after(candidate)
+        return latest
+
+
+@dataclass
+class ScheduledWorkflow:
+    workflow: str
+    cron: str
+    context: dict = None
+    # Random delay added to every run so replicas and neighbours don't fire together
+    jitter_seconds: float = 300
+    # Runs of this job allowed at once; extra fires are skipped, not queued
+    max_concurrent: int = 1
+    # A slot missed while the service was down is run once on start if it is this recent
+    catch_up_window: timedelta = timedelta(hours=24)
+
+
+# Heavy batch workflows, moved to off-peak local time
+SCHEDULES = [
+    ScheduledWorkflow("customer_health_check", "30 2 * * *"),
+    ScheduledWorkflow("weekly_report", "0 6 * * 1", catch_up_window=timedelta(days=2)),
+]
+
+
+class Scheduler:
+    def __init__(self, schedules: list = None, workers: int = AGENT_SCHEDULER_WORKERS):
+        self.jobs = [(job, Cron(job.cron)) for job in (SCHEDULES if schedules is None else schedules)]
+        self._workers = asyncio.Semaphore(workers)
+        self._running = {job.workflow: 0 for job, _ in self.jobs}
+        self._tasks = set()
+        self._loop_task = None
+        self.history = {job.workflow: [] for job, _ in self.jobs}
+        self.next_runs = {}
+        self.skipped = 0
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in (self._loop_task, *self._tasks) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+
+    async def _last_started(self, workflow: str):
+        response = await api_get("/workflows", params={"name": workflow, "limit": 1}, timeout=10)
+        response.raise_for_status()
+        runs = response.json()
+        if not runs:
+            return None
+        return datetime.strptime(runs[0]["started_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+    async def _catch_up(self, now: datetime):
+        for job, cron in self.jobs:
+            missed = cron.latest_at_or_before(now, job.catch_up_window)
+            if missed is None:
+                continue
+            try:
+                last = await self._last_started(job.workflow)
+            except Exception as e:
+                print(f"Scheduler could not check history for {job.workflow}: {e}")
+                continue
+            # Naive slots are local time; run history is stored in UTC
+            if last is None or last < missed.astimezone(timezone.utc):
+                self._dispatch(job, missed, catch_up=True)
+
+    def _dispatch(self, job: ScheduledWorkflow, slot: datetime, catch_up: bool = False):
+        if self._running[job.workflow] >= job.max_concurrent:
+            self.skipped += 1
+            print(f"Scheduler skipped {job.workflow} at {slot}: previous run still active")
+            return
+        self._running[job.workflow] += 1
+        task = asyncio.get_running_loop().create_task(self._execute(job, slot, catch_up))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: ScheduledWorkflow, slot: datetime, catch_up: bool):
+        try:
+            await asyncio.sleep(random.uniform(0, job.jitter_seconds))
+            async with self._workers:
+                started = datetime.now()
+                # The slot makes every scheduled run its own idempotency key
+                context = {**(job.context or {}), "scheduled_for": slot.isoformat()}
+                result = await execute_workflow(job.workflow, context)
+            self.history[job.workflow] = (self.history[job.workflow] + [{
+                "slot": slot.isoformat(),
+                "started_at": started.isoformat(),
+                "finished_at": datetime.now().isoformat(),
+                "catch_up": catch_up,
+                "run_id": result.get("run_id"),
+                "status": result.get("status", "error"),
+            }])[-20:]
+        finally:
+            self._running[job.workflow] -= 1
+
+    async def _run(self):
+        if not self.jobs:
+            return
+        now = datetime.now()
+        await self._catch_up(now)
+        self.next_runs = {job.workflow: cron.next_after(now) for job, cron in self.jobs}
+        while True:
+            now = datetime.now()
+            for job, cron in self.jobs:
+                slot = self.next_runs[job.workflow]
+                if slot <= now:
+                    self._dispatch(job, slot)
+                    self.next_runs[job.workflow] = cron.next_after(now)
+            wake = min(self.next_runs.values())
+            await asyncio.sleep(min(max((wake - datetime.now()).total_seconds(), 0.5), _MAX_SLEEP_SECONDS))
+
+    def status(self) -> dict:
+        return {
+            "jobs": [
+                {
+                    "workflow": job.workflow,
+                    "cron": job.cron,
+                    "next_run": self.next_runs[job.workflow].isoformat() if job.workflow in self.next_runs else None,
+                    "running": self._running[job.workflow],
+                    "recent_runs": self.history[job.workflow],
+                }
+                for job, _ in self.jobs
+            ],
+            "skipped_overlaps": self.skipped,
+        }
+
+
+scheduler = Scheduler()
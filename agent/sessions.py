@@ -0,0 +1,91 @@
+# ABOUTME: Server-side multi-turn chat sessions for the agent
+# ABOUTME: Keeps bounded recent turns, the session's tool-result cache and context per session id; idle sessions are evicted
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from agent.context import TaskContext
+from agent.tool_cache import ToolCache
+
+AGENT_SESSION_IDLE_SECONDS = float(os.getenv("AGENT_SESSION_IDLE_SECONDS", "1800"))
+AGENT_SESSION_MAX = int(os.getenv("AGENT_SESSION_MAX", "500"))
+# User turns kept per session; older turns and the tool results they hold are dropped
+AGENT_SESSION_MAX_TURNS = int(os.getenv("AGENT_SESSION_MAX_TURNS", "12"))
+# Entity lookups stay reusable across a conversation for longer than within one task
+AGENT_SESSION_CACHE_TTL = float(os.getenv("AGENT_SESSION_CACHE_TTL", "300"))
+
+
+class Session:
+    def __init__(self, session_id: str, max_turns: int = AGENT_SESSION_MAX_TURNS):
+        self.id = session_id
+        self.max_turns = max_turns
+        # Conversation after the system prompt: user, assistant and tool messages
+        self.history = []
+        self.cache = ToolCache(ttl=AGENT_SESSION_CACHE_TTL)
+        self.context = TaskContext()
+        # One task at a time per session, so turns don't interleave
+        self.lock = asyncio.Lock()
+        self.turns = 0
+        self.last_used = time.monotonic()
+
+    def record(self, turn: list):
+        """Append one finished turn and drop the oldest turns beyond max_turns."""
+        self.history.extend(turn)
+        self.turns += 1
+        starts = [i for i, message in enumerate(self.history) if message["role"] == "user"]
+        if len(starts) > self.max_turns:
+            dropped = self.history[: starts[-self.max_turns]]
+            self.history = self.history[starts[-self.max_turns]:]
+            self.context.forget(m["tool_call_id"] for m in dropped if m["role"] == "tool")
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "turns": self.turns,
+            "messages": len(self.history),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "tool_cache": self.cache.stats(),
+        }
+
+
+class SessionStore:
+    def __init__(self, idle_seconds: float = AGENT_SESSION_IDLE_SECONDS, max_sessions: int = AGENT_SESSION_MAX):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        # session id -> Session, least recently used first
+        self._sessions = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+
+    def _evict(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used < self.idle_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[oldest.id]
+            self.evicted += 1
+
+    def get(self, session_id: str = None) -> Session:
+        """The live session with this id, or a new one when it is unknown, expired or not given.
+
+        New sessions always get a fresh server-minted id; callers return session.id to the client.
+        """
+        now = time.monotonic()
+        self._evict(now)
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = Session(uuid.uuid4().hex)
+            self._sessions[session.id] = session
+            self.created += 1
+            self._evict(now)
+        session.last_used = now
+        self._sessions.move_to_end(session.id)
+        return session
+
+    def stats(self) -> dict:
+        return {"active": len(self._sessions), "created": self.created, "evicted": self.evicted}
+
+
+sessions = SessionStore()
@@ -0,0 +1,173 @@
+# ABOUTME: Namespaced key/value state store for workflows with per-key TTL and an LRU memory cap
+# ABOUTME: Writes through to SQLite so state survives restarts and is shared between agent processes
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+AGENT_STATE_DB = os.getenv("AGENT_STATE_DB", "agent/state.sqlite3")
+AGENT_STATE_TTL = float(os.getenv("AGENT_STATE_TTL", str(7 * 24 * 3600)))
+AGENT_STATE_MAX_ENTRIES = int(os.getenv("AGENT_STATE_MAX_ENTRIES", "1024"))
+
+DEFAULT_NAMESPACE = "global"
+
+# Values at least this large (encoded) are stored zlib-compressed
+_COMPRESS_MIN_BYTES = 512
+# Expired rows are swept from SQLite every this many writes
+_PURGE_EVERY_WRITES = 500
+
+
+def _encode(value) -> bytes:
+    raw = json.dumps(value, separators=(",", ":"), default=str).encode()
+    if len(raw) >= _COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+
+def _decode(blob: bytes):
+    blob = bytes(blob)
+    raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return json.loads(raw)
+
+
+class StateStore:
+    def __init__(
+        self,
+        path: str = AGENT_STATE_DB,
+        ttl: float = AGENT_STATE_TTL,
+        max_entries: int = AGENT_STATE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (namespace, key) -> (expires_at or None, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workflow_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_state_expires ON workflow_state(expires_at)")
+        self.purge_expired()
+        self._data_version = self._current_data_version()
+
+    def _current_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync(self):
+        """Drop the memory cache when another process has committed to the database."""
+        version = self._current_data_version()
+        if version != self._data_version:
+            self._entries.clear()
+            self._data_version = version
+
+    def _remember(self, slot, expires_at, value):
+        self._entries[slot] = (expires_at, value)
+        self._entries.move_to_end(slot)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, value, namespace: str = DEFAULT_NAMESPACE, ttl: float = None):
+        """Store a value; ttl overrides the store default, and ttl <= 0 never expires."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl > 0 else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workflow_state(namespace, key, value, expires_at, updated_at) VALUES(?,?,?,?,?)",
+                (namespace, key, _encode(value), expires_at, now),
+            )
+            # data_version only moves for other connections' commits, so this entry stays valid
+            self._remember((namespace, key), expires_at, value)
+            self._writes += 1
+            if self._writes % _PURGE_EVERY_WRITES == 0:
+                self._purge_locked(now)
+
+    def get(self, key: str, namespace: str = DEFAULT_NAMESPACE, default=None):
+        slot = (namespace, key)
+        now = time.time()
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(slot)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM workflow_state WHERE namespace=? AND key=? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, now),
+            ).fetchone()
+            if row is None:
+                self._entries.pop(slot, None)
+                return default
+            value = _decode(row[0])
+            self._remember(slot, row[1], value)
+            return value
+
+    def delete(self, key: str, namespace: str = DEFAULT_NAMESPACE):
+        with self._lock:
+            self._conn.execute("DELETE FROM workflow_state WHERE namespace=? AND key=?", (namespace, key))
+            self._entries.pop((namespace, key), None)
+
+    def clear_namespace(self, namespace: str):
+        """Drop every key of a namespace, e.g. when a workflow run or session ends."""
+        with self._lock:
+            self._conn.execute("DELETE FROM workflow_state WHERE namespace=?", (namespace,))
+            for slot in [s for s in self._entries if s[0] == namespace]:
+                del self._entries[slot]
+
+    def _purge_locked(self, now: float) -> int:
+        cur = self._conn.execute("DELETE FROM workflow_state WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        for slot in [s for s, (expires_at, _) in self._entries.items() if expires_at is not None and expires_at <= now]:
+            del self._entries[slot]
+        return cur.rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Process-wide store, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StateStore()
+        return _store
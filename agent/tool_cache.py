@@ -0,0 +1,72 @@
+# ABOUTME: Conversation-scoped memoization of read-only tool results
+# ABOUTME: TTL plus size-bounded LRU eviction, invalidated by tool name when a mutating tool runs
+import json
+import os
+import time
+from collections import OrderedDict
+
+AGENT_TOOL_CACHE_TTL = float(os.getenv("AGENT_TOOL_CACHE_TTL", "60"))
+AGENT_TOOL_CACHE_SIZE = int(os.getenv("AGENT_TOOL_CACHE_SIZE", "128"))
+
+# Marker for mutating tools whose effects are too broad to scope
+INVALIDATE_ALL = "*"
+
+
+class ToolCache:
+    def __init__(self, ttl: float = AGENT_TOOL_CACHE_TTL, max_entries: int = AGENT_TOOL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expires_at, tool name, result), least recently used first
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(name: str, args: dict) -> str:
+        return f"{name}:{json.dumps(args, sort_keys=True, separators=(',', ':'), default=str)}"
+
+    def get(self, name: str, args: dict):
+        """Return (True, result) on a live hit, otherwise (False, None)."""
+        key = self.key(name, args)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[2]
+
+    def put(self, name: str, args: dict, result):
+        key = self.key(name, args)
+        self._entries[key] = (time.monotonic() + self.ttl, name, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tool_names):
+        """Drop cached results of the given tools, or everything for INVALIDATE_ALL."""
+        if not tool_names:
+            return
+        if INVALIDATE_ALL in tool_names:
+            stale = list(self._entries)
+        else:
+            stale = [k for k, (_, name, _) in self._entries.items() if name in tool_names]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
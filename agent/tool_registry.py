@@ -0,0 +1,118 @@
+# ABOUTME: Registry mapping tool names from the OpenAI schemas to their implementations
+# ABOUTME: Marks each tool read-only or mutating so the agent loop knows what can run concurrently
+import inspect
+from dataclasses import dataclass, field
+from typing import Callable
+
+from agent.context import get_tool_result
+from agent.tool_cache import INVALIDATE_ALL
+from agent.tools import (
+    search_customers,
+    list_tickets,
+    create_note,
+    send_email,
+    emit_intent,
+    get_customer_stats,
+    bulk_update_tickets,
+    generate_report,
+    workflow_decision,
+    set_workflow_state,
+    get_workflow_state,
+    create_customer,
+    schedule_followup,
+    check_sla_status,
+    assign_ticket,
+    create_visualization,
+)
+from agent.workflows import execute_workflow
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    name: str
+    fn: Callable
+    # Read-only tools have no side effects and may run concurrently with each other
+    read_only: bool
+    # emit_intent takes the whole argument object rather than keyword arguments
+    takes_args_dict: bool = False
+    # Cached read-only tools whose results a mutating tool makes stale
+    invalidates: tuple = ()
+    # Results already sized for the conversation go in as-is: never compacted or cached
+    raw_result: bool = False
+    is_async: bool = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "is_async", inspect.iscoroutinefunction(self.fn))
+
+
+TOOLS = {
+    spec.name: spec
+    for spec in (
+        ToolSpec("tool_search_customers", search_customers, read_only=True),
+        ToolSpec("tool_list_tickets", list_tickets, read_only=True),
+        ToolSpec("tool_get_customer_stats", get_customer_stats, read_only=True),
+        ToolSpec("tool_generate_report", generate_report, read_only=True),
+        ToolSpec("tool_check_sla_status", check_sla_status, read_only=True),
+        ToolSpec("tool_workflow_decision", workflow_decision, read_only=True),
+        ToolSpec("tool_get_workflow_state", get_workflow_state, read_only=True),
+        # Pages of stored results; compacting or caching them would return stubs instead of rows
+        ToolSpec("tool_get_tool_result", get_tool_result, read_only=True, raw_result=True),
+        # UI intents are ordered side effects, so they are treated as mutations
+        ToolSpec("tool_emit_view_intent", emit_intent, read_only=False, takes_args_dict=True),
+        ToolSpec("tool_create_visualization", create_visualization, read_only=False),
+        ToolSpec(
+            "tool_create_note",
+            create_note,
+            read_only=False,
+            invalidates=("tool_list_tickets", "tool_check_sla_status", "tool_generate_report"),
+        ),
+        ToolSpec("tool_send_email", send_email, read_only=False),
+        ToolSpec(
+            "tool_bulk_update_tickets",
+            bulk_update_tickets,
+            read_only=False,
+            invalidates=(
+                "tool_search_customers",
+                "tool_list_tickets",
+                "tool_get_customer_stats",
+                "tool_generate_report",
+                "tool_check_sla_status",
+            ),
+        ),
+        ToolSpec("tool_execute_workflow", execute_workflow, read_only=False, invalidates=(INVALIDATE_ALL,)),
+        ToolSpec(
+            "tool_set_workflow_state",
+            set_workflow_state,
+            read_only=False,
+            invalidates=("tool_get_workflow_state",),
+        ),
+        ToolSpec(
+            "tool_create_customer",
+            create_customer,
+            read_only=False,
+            invalidates=("tool_search_customers", "tool_get_customer_stats", "tool_generate_report"),
+        ),
+        ToolSpec("tool_schedule_followup", schedule_followup, read_only=False),
+        ToolSpec(
+            "tool_assign_ticket",
+            assign_ticket,
+            read_only=False,
+            invalidates=("tool_list_tickets", "tool_check_sla_status", "tool_generate_report"),
+        ),
+    )
+}
+
+
+def is_read_only(name: str) -> bool:
+    spec = TOOLS.get(name)
+    return spec is not None and spec.read_only
+
+
+def is_cacheable(name: str) -> bool:
+    spec = TOOLS.get(name)
+    return spec is not None and spec.read_only and not spec.raw_result
+
+
+def is_raw_result(name: str) -> bool:
+    spec = TOOLS.get(name)
+    return spec is not None and spec.raw_result
@@ -0,0 +1,170 @@
+# ABOUTME: Local tool router that offers the model only the tool schemas relevant to the conversation
+# ABOUTME: IDF-weighted keyword scoring over tool names, descriptions and parameters; widens to every tool when unsure
+import json
+import math
+import os
+import re
+
+from agent.context import count_tokens
+from agent.openai_client import tools
+
+AGENT_TOOL_ROUTER_ENABLED = os.getenv("AGENT_TOOL_ROUTER_ENABLED", "1") == "1"
+# Most scored tools added per model call, on top of the always-offered ones
+AGENT_TOOL_ROUTER_MAX = int(os.getenv("AGENT_TOOL_ROUTER_MAX", "6"))
+# Tools scoring below this fraction of the best match are left out
+_RELATIVE_CUTOFF = 0.25
+# A word in the tool's own name says more about it than one in its parameters
+_NAME_WEIGHT = 2.0
+
+# Every answer should set a view, so the view tool is always on offer
+ALWAYS_OFFERED = ("tool_emit_view_intent",)
+# Named entities ("Acme's tickets") have to be resolved to ids through a customer search first
+_ENTITY_TOOL = "tool_search_customers"
+_CAPITALIZED = re.compile(r"\b[A-Z][a-z]+")
+_SENTENCE_START = re.compile(r"(?:^|[.!?]\s+)$")
+# Words capitalized only because they open a sentence: requests start with a verb or a stop word
+_LEADING_WORDS = frozenset(
+    "add assign check close create display email escalate find give how list look open pull "
+    "run schedule search send set show tell update view who why".split()
+)
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from get give i in is it me my of on or our please show "
+    "some than that the their them then these this to up us use we what when which with you your".split()
+)
+
+# User vocabulary mapped onto the words the schemas use
+_ALIASES = {
+    "graph": "chart",
+    "plot": "chart",
+    "visualize": "chart",
+    "mail": "email",
+    "stats": "statistics",
+    "overdue": "sla",
+    "breach": "sla",
+    "followup": "follow",
+    "overview": "dashboard",
+    "reassign": "assign",
+    "notes": "note",
+    "comment": "note",
+}
+
+
+_SCHEMA_KEYWORDS = frozenset(("name", "description", "parameters", "properties", "items", "enum"))
+
+
+def _terms(text: str) -> set:
+    """Lowercased words, aliased and truncated to a six-letter stem so plurals and inflections match."""
+    terms = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        word = _ALIASES.get(word, word)
+        if len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        terms.add(word[:6])
+    return terms
+
+
+def _schema_text(schema) -> str:
+    """Everything in a schema that names what the tool is for: name, descriptions, parameters, enums."""
+    if isinstance(schema, dict):
+        parts = []
+        for key, value in schema.items():
+            if key in ("type", "required", "default"):
+                continue
+            # Parameter names say what a tool works on; JSON-schema keywords say nothing
+            if key not in _SCHEMA_KEYWORDS:
+                parts.append(key)
+            parts.append(_schema_text(value))
+        return " ".join(parts)
+    if isinstance(schema, list):
+        return " ".join(_schema_text(item) for item in schema)
+    return str(schema).replace("_", " ")
+
+
+def _has_entity(text: str) -> bool:
+    """Whether text names something, judged by capitalization; "Acme open tickets" does, "Show open tickets" does not."""
+    for match in _CAPITALIZED.finditer(text):
+        word = match.group().lower()
+        if _SENTENCE_START.search(text[: match.start()]) and (word in _STOPWORDS or word in _LEADING_WORDS):
+            continue
+        return True
+    return False
+
+
+class ToolRouter:
+    """Per-task tool selection; the offered set only grows, so the model never loses a tool mid-task."""
+
+    def __init__(self, schemas: list = tools, max_tools: int = AGENT_TOOL_ROUTER_MAX, enabled: bool = AGENT_TOOL_ROUTER_ENABLED):
+        self.schemas = {schema["function"]["name"]: schema for schema in schemas}
+        self.max_tools = max_tools
+        self._terms = {name: _terms(_schema_text(schema["function"])) for name, schema in self.schemas.items()}
+        self._name_terms = {name: _terms(name.replace("_", " ")) for name in self.schemas}
+        counts = {}
+        for terms in self._terms.values():
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+        self._idf = {term: math.log(1 + len(self.schemas) / n) for term, n in counts.items()}
+        self._tokens = {name: count_tokens(json.dumps(schema)) for name, schema in self.schemas.items()}
+        self.selected = {name for name in ALWAYS_OFFERED if name in self.schemas}
+        self.full = not enabled
+        self.stats = {"calls": 0, "tools_offered": 0, "tokens_offered": 0, "tokens_saved": 0, "widened": 0}
+
+    def _score(self, query: set) -> list:
+        scores = {
+            name: sum(self._idf[t] * (_NAME_WEIGHT if t in self._name_terms[name] else 1) for t in query & terms)
+            for name, terms in self._terms.items()
+        }
+        best = max(scores.values(), default=0)
+        if best <= 0:
+            return []
+        # Ties go to the more specific tool, the one with the smaller vocabulary
+        ranked = sorted(
+            (name for name, score in scores.items() if score >= best * _RELATIVE_CUTOFF),
+            key=lambda n: (-scores[n], len(self._terms[n])),
+        )
+        return ranked[: self.max_tools]
+
+    def select(self, messages: list, required=()) -> list:
+        """Schemas to offer for the next model call.
+
+        Scores the user's messages and the latest assistant text; tools already
+        called in the conversation and `required` names are always kept.
+        """
+        if not self.full:
+            text = [m["content"] for m in messages if m["role"] == "user" and m.get("content")]
+            assistant = [m for m in messages if m["role"] == "assistant"]
+            if assistant and assistant[-1].get("content"):
+                text.append(assistant[-1]["content"])
+            matched = self._score(_terms(" ".join(text)))
+            if matched and any(_has_entity(t) for t in text):
+                matched.append(_ENTITY_TOOL)
+            if not matched and len(self.selected) <= len(ALWAYS_OFFERED):
+                # Nothing in the goal points at a tool; better every tool than the wrong few
+                self.full = True
+            self.selected.update(matched)
+            self.selected.update(name for name in required if name in self.schemas)
+            for message in assistant:
+                self.selected.update(
+                    call["function"]["name"] for call in message.get("tool_calls") or [] if call["function"]["name"] in self.schemas
+                )
+
+        names = list(self.schemas) if self.full else [name for name in self.schemas if name in self.selected]
+        offered = sum(self._tokens[name] for name in names)
+        self.stats["calls"] += 1
+        self.stats["tools_offered"] += len(names)
+        self.stats["tokens_offered"] += offered
+        self.stats["tokens_saved"] += sum(self._tokens.values()) - offered
+        return [self.schemas[name] for name in names]
+
+    def observe(self, tool_calls):
+        """Fall back to every tool once the model asks for one it was not offered."""
+        if self.full:
+            return
+        if any(call.function.name not in self.selected for call in tool_calls):
+            self.full = True
+            self.stats["widened"] += 1
+
+    def report(self) -> dict:
+        return {**self.stats, "full_set": self.full, "selected": sorted(self.selected)}
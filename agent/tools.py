@@ -1,124 +1,188 @@
 # ABOUTME: Tool functions for the agent system
 # ABOUTME: HTTP clients for API calls and WebSocket intent emitter for UI control
-import httpx
-import json
-import websockets
-import os
+import asyncio
 from typing import Optional
 
-API_BASE = os.getenv("API_BASE", "http://localhost:8000")
-AGENT_WS = os.getenv("AGENT_WS", "ws://localhost:8765")
+from agent.charts import MEASURE_LABELS, render_chart, spec_for_query
+from agent.fetch_scope import fetch_scope, get_json
+from agent.http_client import api_get, api_post
+from agent.publisher import publisher
+from agent.state_store import DEFAULT_NAMESPACE, get_state_store
 
 
-def start_workflow(name: str):
+async def start_workflow(name: str, context: Optional[str] = None):
     """Start a workflow run and return its metadata."""
-    with httpx.Client() as client:
-        response = client.post(
-            f"{API_BASE}/workflows", json={"name": name}, timeout=10
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await api_post(
+        "/workflows", json={"name": name, "context": context}, timeout=10
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_workflow_run(run_id: int):
+    """Fetch a workflow run together with its recorded steps."""
+    response = await api_get(f"/workflows/{run_id}", timeout=10)
+    response.raise_for_status()
+    return response.json()
 
 
-def record_workflow_step(run_id: int, name: str, status: str, result: Optional[str] = None):
+async def finish_workflow(run_id: int, status: str, result: Optional[str] = None):
+    """Mark a workflow run completed or failed."""
+    response = await api_post(
+        f"/workflows/{run_id}/finish",
+        json={"status": status, "result": result},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def record_workflow_step(run_id: int, name: str, status: str, result: Optional[str] = None):
     """Record a step's progress for a workflow run."""
-    with httpx.Client() as client:
-        response = client.post(
-            f"{API_BASE}/workflows/{run_id}/steps",
-            json={"name": name, "status": status, "result": result},
-            timeout=10,
-        )
-        response.raise_for_status()
-        return response.json()
+    response = await api_post(
+        f"/workflows/{run_id}/steps",
+        json={"name": name, "status": status, "result": result},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+# Free-text locations the model tends to use, mapped to the `region` column values
+REGION_ALIASES = {
+    "North America": ("north america", "usa", "us", "united states", "canada", "america"),
+    "Europe": ("europe", "eu", "emea", "uk", "germany", "france"),
+    "Asia Pacific": ("asia pacific", "apac", "asia", "japan", "india", "australia"),
+}
+
+PLAN_TYPES = ("enterprise", "premium", "professional", "starter", "trial")
+
+
+def _region_for(location: str):
+    location_lower = location.lower().strip()
+    for region, aliases in REGION_ALIASES.items():
+        if location_lower in aliases or any(alias in location_lower.split() for alias in aliases):
+            return region
+    return location
+
+
+def criteria_filters(criteria: str) -> dict:
+    """Translate free-text criteria into structured /customers filters."""
+    criteria_lower = criteria.lower()
+    filters = {}
+    if "high activity" in criteria_lower:
+        filters["min_open_tickets"] = 2
+    if "churn" in criteria_lower:
+        filters["lifecycle_stage"] = "churn_risk"
+    elif "at risk" in criteria_lower or "unhealthy" in criteria_lower:
+        filters["max_health"] = 60
+    elif "healthy" in criteria_lower:
+        filters["min_health"] = 80
+    if "high value" in criteria_lower:
+        filters["min_mrr"] = 10000
+    for plan in PLAN_TYPES:
+        if plan in criteria_lower:
+            if plan == "trial":
+                filters["lifecycle_stage"] = "trial"
+            else:
+                filters["plan_type"] = plan
+            break
+    return filters
+
+
+async def search_customers(
+    name: str = None,
+    location: str = None,
+    criteria: str = None,
+    region: str = None,
+    industry: str = None,
+    plan_type: str = None,
+    lifecycle_stage: str = None,
+    min_health: int = None,
+    max_health: int = None,
+    min_mrr: float = None,
+    max_mrr: float = None,
+    min_open_tickets: int = None,
+):
+    """Search customers by various criteria; all filtering happens in the backend query."""
+    params = {}
+    if criteria:
+        params.update(criteria_filters(criteria))
+    if location and not region:
+        region = _region_for(location)
+    
+    explicit = {
+        "name": name,
+        "region": region,
+        "industry": industry,
+        "plan_type": plan_type,
+        "lifecycle_stage": lifecycle_stage,
+        "min_health": min_health,
+        "max_health": max_health,
+        "min_mrr": min_mrr,
+        "max_mrr": max_mrr,
+        "min_open_tickets": min_open_tickets,
+    }
+    params.update({k: v for k, v in explicit.items() if v is not None and v != ""})
+    
+    response = await api_get("/customers", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
 
 
-def search_customers(name: str = None, location: str = None, criteria: str = None):
-    """Search customers by various criteria."""
-    with httpx.Client() as client:
-        params = {}
-        if name:
-            params["name"] = name
-        
-        response = client.get(f"{API_BASE}/customers", params=params, timeout=10)
-        response.raise_for_status()
-        customers = response.json()
-        
-        # Apply additional filtering based on criteria
-        if location and customers:
-            # Mock location filtering - in real system would be in database
-            location_keywords = location.lower().split()
-            filtered = []
-            for customer in customers:
-                # Simple mock: check if location keywords appear in customer name/email
-                customer_text = f"{customer.get('name', '')} {customer.get('email', '')}".lower()
-                if any(keyword in customer_text for keyword in location_keywords):
-                    filtered.append(customer)
-            customers = filtered
-            
-        if criteria and customers:
-            # Apply general criteria filtering
-            criteria_lower = criteria.lower()
-            if "high activity" in criteria_lower:
-                # Mock: return customers with more tickets (simplified)
-                enriched_customers = []
-                for customer in customers:
-                    tickets_response = client.get(
-                        f"{API_BASE}/tickets",
-                        params={"customer_id": customer["id"]},
-                        timeout=10
-                    )
-                    ticket_count = len(tickets_response.json())
-                    customer["ticket_count"] = ticket_count
-                    if ticket_count > 2:  # Mock threshold
-                        enriched_customers.append(customer)
-                customers = enriched_customers
-                
-        return customers
-
-
-def list_tickets(customer_id: str, status: str = "open"):
-    with httpx.Client() as client:
-        response = client.get(
-            f"{API_BASE}/tickets",
-            params={"customer_id": customer_id, "status": status},
-            timeout=10,
-        )
-        response.raise_for_status()
-        return response.json()
+async def list_tickets(customer_id: str, status: str = "open"):
+    response = await api_get(
+        "/tickets",
+        params={"customer_id": customer_id, "status": status},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
 
 
-def create_note(ticket_id: str, body: str):
-    with httpx.Client() as client:
-        response = client.post(
-            f"{API_BASE}/notes", json={"ticket_id": ticket_id, "body": body}, timeout=10
-        )
-        if response.status_code >= 400:
-            raise RuntimeError(response.json())
-        return response.json()
+async def create_note(ticket_id: str, body: str):
+    response = await api_post(
+        "/notes", json={"ticket_id": ticket_id, "body": body}, timeout=10
+    )
+    if response.status_code >= 400:
+        raise RuntimeError(response.json())
+    return response.json()
 
 
-def send_email(to: str, subject: str, body: str):
-    with httpx.Client() as client:
-        response = client.post(
-            f"{API_BASE}/emails",
-            json={"to": to, "subject": subject, "body": body},
-            timeout=10,
-        )
-        response.raise_for_status()
-        return response.json()
+async def send_email(to: str, subject: str, body: str):
+    response = await api_post(
+        "/emails",
+        json={"to": to, "subject": subject, "body": body},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
 
 
 async def emit_intent(intent: dict):
-    try:
-        async with websockets.connect(AGENT_WS) as ws:
-            await ws.send(json.dumps(intent))
-            return {"status": "sent", "intent": intent}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    """Queue an intent on the shared publisher; delivery happens in the background.
+
+    The status says whether the intent can actually reach the UI: "queued" while
+    the WebSocket server is reachable, "pending" while it is not (the intent goes
+    out on reconnect, if it comes before shutdown), "error" when it was dropped.
+    """
+    if not await publisher.publish(intent):
+        return {
+            "status": "error",
+            "message": "Intent queue is full, intent dropped",
+            "dropped": publisher.metrics["dropped"],
+        }
+    if publisher.last_error is not None:
+        return {
+            "status": "pending",
+            "intent": intent,
+            "message": f"WebSocket server unreachable ({publisher.last_error}); intent not delivered yet",
+        }
+    return {"status": "queued", "intent": intent}
 
 
 
-def tool_receive_event(event: dict):
+async def tool_receive_event(event: dict):
     """Process events received from the frontend.
 
     Events can trigger workflows or update internal state. The payload
@@ -132,7 +196,14 @@ def tool_receive_event(event: dict):
         workflow = event.get("name")
         context = event.get("context", {})
         if workflow:
-            return execute_workflow(workflow, context)
+            from agent.workflows import execute_workflow
+
+            return await execute_workflow(
+                workflow,
+                context,
+                run_id=event.get("run_id"),
+                idempotency_key=event.get("idempotency_key"),
+            )
         return {"status": "error", "message": "missing workflow name"}
 
     # Persist arbitrary state
@@ -140,7 +211,7 @@ def tool_receive_event(event: dict):
         key = event.get("key")
         value = event.get("value", {})
         if key:
-            return set_workflow_state(key, value)
+            return set_workflow_state(key, value, namespace=event.get("namespace", DEFAULT_NAMESPACE))
         return {"status": "error", "message": "missing state key"}
 
     # Default: acknowledge receipt
@@ -158,471 +229,243 @@ async def tool_add_component(component: str, component_id: str, props: dict | No
 
 
 
-def get_customer_stats(metric: str):
+async def _ticket_counts(dimension: str) -> dict:
+    """Ticket counts grouped by a chart dimension, from one aggregate query."""
+    response = await api_post(
+        "/charts/query",
+        json={"entity": "tickets", "measure": "count", "dimension": dimension},
+        timeout=10,
+    )
+    response.raise_for_status()
+    data = response.json()
+    return dict(zip(data["labels"], data["values"]))
+
+
+async def get_customer_stats(metric: str):
     """Get customer analytics and statistics."""
-    with httpx.Client() as client:
-        # Get all customers
-        customers_response = client.get(f"{API_BASE}/customers", timeout=10)
-        customers = customers_response.json()
-        
+    async with fetch_scope() as scope:
         if metric == "ticket_count":
-            stats = []
-            for customer in custom30ers:
-                tickets_response = client.get(
-                    f"{API_BASE}/tickets",
-                    params={"customer_id": customer["id"]},
-                    timeout=10
-                )
-                ticket_count = len(tickets_response.json())
-                stats.append({
-                    "customer": customer["name"],
-                    "ticket_count": ticket_count
-                })
+            customers, counts = await asyncio.gather(get_json("/customers"), _ticket_counts("customer_id"))
+            stats = [
+                {"customer": customer["name"], "ticket_count": counts.get(customer["id"], 0)}
+                for customer in customers
+            ]
             return {"metric": "ticket_count", "data": stats}
-            
+
         elif metric == "status_summary":
-            total_open = 0
-            total_closed = 0
-            for customer in customers:
-                open_tickets = client.get(
-                    f"{API_BASE}/tickets",
-                    params={"customer_id": customer["id"], "status": "open"},
-                    timeout=10
-                ).json()
-                closed_tickets = client.get(
-                    f"{API_BASE}/tickets", 
-                    params={"customer_id": customer["id"], "status": "closed"},
-                    timeout=10
-                ).json()
-                total_open += len(open_tickets)
-                total_closed += len(closed_tickets)
-            
+            customers, by_status = await asyncio.gather(get_json("/customers"), _ticket_counts("status"))
             return {
                 "metric": "status_summary",
                 "data": {
                     "total_customers": len(customers),
-                    "total_open_tickets": total_open,
-                    "total_closed_tickets": total_closed
+                    "total_open_tickets": by_status.get("open", 0),
+                    "total_closed_tickets": by_status.get("closed", 0)
                 }
             }
-        
+
         elif metric == "all":
-            # Combine multiple metrics
-            stats = get_customer_stats("ticket_count")
-            summary = get_customer_stats("status_summary")
+            # Both halves need the customer list; the scope fetches it once
+            stats, summary = await asyncio.gather(
+                get_customer_stats("ticket_count"), get_customer_stats("status_summary")
+            )
             return {
                 "metric": "all",
                 "ticket_counts": stats["data"],
-                "summary": summary["data"]
+                "summary": summary["data"],
+                "timings": scope.report()
             }
-            
-        return {"metric": metric, "data": "Metric not implemented yet"}
 
+    return {"metric": metric, "data": "Metric not implemented yet"}
 
-def bulk_update_tickets(operation: str, criteria: str = "", new_status: str = ""):
+
+async def bulk_update_tickets(operation: str, criteria: str = "", new_status: str = ""):
     """Perform bulk operations on tickets."""
-    with httpx.Client() as client:
-        # Get all customers to iterate through their tickets
-        customers_response = client.get(f"{API_BASE}/customers", timeout=10)
-        customers = customers_response.json()
-        
-        updated_count = 0
-        
-        if operation == "close_resolved":
-            # This is a mock operation - in real system would check ticket content/notes
-            for customer in customers:
-                tickets_response = client.get(
-                    f"{API_BASE}/tickets",
-                    params={"customer_id": customer["id"], "status": "open"},
-                    timeout=10
-                )
-                tickets = tickets_response.json()
-                # Mock: close tickets older than a certain date (simplified)
-                for ticket in tickets[:2]:  # Close first 2 open tickets as demo
-                    # In real system, would call UPDATE endpoint
-                    updated_count += 1
-            
-            return {
-                "operation": operation,
-                "updated_count": updated_count,
-                "message": f"Closed {updated_count} resolved tickets"
-            }
+    # Get all customers to iterate through their tickets
+    customers_response = await api_get("/customers", timeout=10)
+    customers = customers_response.json()
+    
+    updated_count = 0
+    
+    if operation == "close_resolved":
+        # This is a mock operation - in real system would check ticket content/notes
+        for customer in customers:
+            tickets_response = await api_get(
+                "/tickets",
+                params={"customer_id": customer["id"], "status": "open"},
+                timeout=10
+            )
+            tickets = tickets_response.json()
+            # Mock: close tickets older than a certain date (simplified)
+            for ticket in tickets[:2]:  # Close first 2 open tickets as demo
+                # In real system, would call UPDATE endpoint
+                updated_count += 1
         
         return {
             "operation": operation,
-            "updated_count": 0,
-            "message": f"Operation '{operation}' not fully implemented yet"
+            "updated_count": updated_count,
+            "message": f"Closed {updated_count} resolved tickets"
         }
+    
+    return {
+        "operation": operation,
+        "updated_count": 0,
+        "message": f"Operation '{operation}' not fully implemented yet"
+    }
 
 
-async def create_visualization(chart_type: str, data_query: str, title: str = "", description: str = ""):
-    """Create dynamic visualizations based on user queries."""
-    with httpx.Client() as client:
-        # Determine what data to fetch based on the query
-        chart_data = None
-        chart_config = None
+async def create_visualization(chart_type: str, data_query: str, title: str = "", description: str = "", spec: dict = None):
+    """Create dynamic visualizations based on user queries.
+
+    The data comes from one aggregate query compiled from a chart spec; when no
+    spec is given one is picked from the wording of `data_query`.
+    """
+    try:
+        default_title = "Custom Chart"
+        if spec is None:
+            spec, default_title = spec_for_query(data_query)
         
-        try:
-            if "customer" in data_query.lower() and ("ticket" in data_query.lower() or "activity" in data_query.lower()):
-                # Customer activity/ticket data
-                customers_response = client.get(f"{API_BASE}/customers", timeout=10)
-                customers = customers_response.json()
-                
-                customer_data = []
-                for customer in customers[:8]:  # Top 8 for readability
-                    tickets_response = client.get(
-                        f"{API_BASE}/tickets",
-                        params={"customer_id": customer["id"]},
-                        timeout=10
-                    )
-                    ticket_count = len(tickets_response.json())
-                    customer_data.append({
-                        "label": customer["name"].split()[0],  # First name only
-                        "value": ticket_count,
-                        "fullName": customer["name"]
-                    })
-                
-                # Sort by value (ticket count)
-                customer_data.sort(key=lambda x: x["value"], reverse=True)
-                
-                if chart_type in ["bar", "column"]:
-                    chart_config = {
-                        "type": "bar",
-                        "data": {
-                            "labels": [item["label"] for item in customer_data],
-                            "datasets": [{
-                                "label": "Tickets",
-                                "data": [item["value"] for item in customer_data],30
-                                "backgroundColor": [
-                                    "rgba(79, 70, 229, 0.8)",
-                                    "rgba(124, 58, 237, 0.8)", 
-                                    "rgba(236, 72, 153, 0.8)",
-                                    "rgba(34, 197, 94, 0.8)",
-                                    "rgba(249, 115, 22, 0.8)",
-                                    "rgba(59, 130, 246, 0.8)",
-                                    "rgba(168, 85, 247, 0.8)",
-                                    "rgba(244, 63, 94, 0.8)"
-                                ],
-                                "borderColor": [
-                                    "rgba(79, 70, 229, 1)",
-                                    "rgba(124, 58, 237, 1)", 
-                                    "rgba(236, 72, 153, 1)",
-                                    "rgba(34, 197, 94, 1)",
-                                    "rgba(249, 115, 22, 1)",
-                                    "rgba(59, 130, 246, 1)",
-                                    "rgba(168, 85, 247, 1)",
-                                    "rgba(244, 63, 94, 1)"
-                                ],
-                                "borderWidth": 2,
-                                "borderRadius": 8
-                            }]
-                        },
-                        "options": {
-                            "responsive": True,
-                            "plugins": {
-                                "title": {
-                                    "display": True,
-                                    "text": title or "Customer Activity",
-                                    "color": "#f1f5f9",
-                                    "font": {"size": 16}
-                                },
-                                "legend": {
-                                    "labels": {
-                                        "color": "#f1f5f9"
-                                    }
-                                }
-                            },
-                            "scales": {
-                                "y": {
-                                    "ticks": {"color": "#94a3b8"},
-                                    "grid": {"color": "rgba(148, 163, 184, 0.1)"}
-                                },
-                                "x": {
-                                    "ticks": {"color": "#94a3b8"},
-                                    "grid": {"color": "rgba(148, 163, 184, 0.1)"}
-                                }
-                            }
-                        }
-                    }
-                    
-                elif chart_type in ["pie", "doughnut"]:
-                    chart_config = {
-                        "type": "doughnut",
-                        "data": {
-                            "labels": [item["label"] for item in customer_data[:6]],  # Top 6 for pie
-                            "datasets": [{
-                                "data": [item["value"] for item in customer_data[:6]],
-                                "backgroundColor": [
-                                    "rgba(79, 70, 229, 0.8)",
-                                    "rgba(124, 58, 237, 0.8)", 
-                                    "rgba(236, 72, 153, 0.8)",
-                                    "rgba(34, 197, 94, 0.8)",
-                                    "rgba(249, 115, 22, 0.8)",
-                                    "rgba(59, 130, 246, 0.8)"
-                                ],
-                                "borderColor": [
-                                    "rgba(79, 70, 229, 1)",
-                                    "rgba(124, 58, 237, 1)", 
-                                    "rgba(236, 72, 153, 1)",
-                                    "rgba(34, 197, 94, 1)",
-                                    "rgba(249, 115, 22, 1)",
-                                    "rgba(59, 130, 246, 1)"
-                                ],
-                                "borderWidth": 2
-                            }]
-                        },
-                        "options": {
-                            "responsive": True,
-                            "plugins": {
-                                "title": {
-                                    "display": True,
-                                    "text": title or "Customer Distribution",
-                                    "color": "#f1f5f9",
-                                    "font": {"size": 16}
-                                },
-                                "legend": {
-                                    "labels": {
-                                        "color": "#f1f5f9"
-                                    }
-                                }
-                            }
-                        }
-                    }
-            
-            elif "ticket" in data_query.lower() and ("status" in data_query.lower() or "resolution" in data_query.lower()):
-                # Ticket status/resolution data
-                customers_response = client.get(f"{API_BASE}/customers", timeout=10)
-                customers = customers_response.json()
-                
-                total_open = 0
-                total_closed = 0
-                for customer in customers:
-                    open_tickets = client.get(
-                        f"{API_BASE}/tickets",30
-                        params={"customer_id": customer["id"], "status": "open"},
-                        timeout=10
-                    ).json()
-                    closed_tickets = client.get(
-                        f"{API_BASE}/tickets", 
-                        params={"customer_id": customer["id"], "status": "closed"},
-                        timeout=10
-                    ).json()
-                    total_open += len(open_tickets)
-                    total_closed += len(closed_tickets)
-                
-                chart_config = {
-                    "type": "doughnut",
-                    "data": {
-                        "labels": ["Open Tickets", "Closed Tickets"],
-                        "datasets": [{
-                            "data": [total_open, total_closed],
-                            "backgroundColor": [
-                                "rgba(249, 115, 22, 0.8)",
-                                "rgba(34, 197, 94, 0.8)"
-                            ],
-                            "borderColor": [
-                                "rgba(249, 115, 22, 1)",
-                                "rgba(34, 197, 94, 1)"
-                            ],
-                            "borderWidth": 2
-                        }]
-                    },
-                    "options": {
-                        "responsive": True,
-                        "plugins": {
-                            "title": {
-                                "display": True,
-                                "text": title or "Ticket Status Distribution",
-                                "color": "#f1f5f9",
-                                "font": {"size": 16}
-                            },
-                            "legend": {
-                                "labels": {
-                                    "color": "#f1f5f9"
-                                }
-                            }
-                        }
-                    }
-                }
-            
-            elif "trend" in data_query.lower() or "time" in data_query.lower():
-                # Mock time-series data for trends
-                months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]
-                ticket_data = [12, 19, 15, 22, 18, 25]  # Mock trend data
-                
-                chart_config = {
-                    "type": "line",
-                    "data": {
-                        "labels": months,
-                        "datasets": [{
-                            "label": "Tickets Created",
-                            "data": ticket_data,
-                            "borderColor": "rgba(79, 70, 229, 1)",
-                            "backgroundColor": "rgba(79, 70, 229, 0.1)",
-                            "borderWidth": 3,
-                            "fill": True,
-                            "tension": 0.4
-                        }]
-                    },
-                    "options": {
-                        "responsive": True,
-                        "plugins": {
-                            "title": {
-                                "display": True,
-                                "text": title or "Ticket Trends Over Time",
-                                "color": "#f1f5f9",
-                                "font": {"size": 16}
-                            },
-                            "legend": {
-                                "labels": {
-                                    "color": "#f1f5f9"
-                                }
-                            }
-                        },
-                        "scales": {
-                            "y": {
-                                "ticks": {"color": "#94a3b8"},
-                                "grid": {"color": "rgba(148, 163, 184, 0.1)"}
-                            },
-                            "x": {
-                                "ticks": {"color": "#94a3b8"},
-                                "grid": {"color": "rgba(148, 163, 184, 0.1)"}
-                            }
-                        }
-                    }
-                }
-            
-            else:
-                # Default: customer ticket counts
-                return await create_visualization("bar", "customer ticket activity", title, description)
-            
-            # Send chart via WebSocket
-            intent = {
-                "type": "render_chart",
-                "chartConfig": chart_config,
-                "containerId": "dynamic-chart",
-                "title": title,
-                "description": description
-            }
-            
-            result = await emit_intent(intent)
-            
-            return {
-                "status": "success",
-                "chart_type": chart_type,
-                "data_query": data_query,
-                "title": title,
-                "intent_result": result
-            }
-            
-        except Exception as e:
-            return {
-                "status": "error",
-                "message": f"Failed to create visualization: {str(e)}",
-                "chart_type": chart_type,
-                "data_query": data_query
-            }
+        response = await api_post("/charts/query", json=spec, timeout=10)
+        if response.status_code >= 400:
+            raise RuntimeError(response.json())
+        chart_data = response.json()
+        
+        chart_config = render_chart(
+            chart_type,
+            chart_data["labels"],
+            chart_data["values"],
+            title or default_title,
+            MEASURE_LABELS.get(chart_data["spec"]["measure"], "Value"),
+        )
+        
+        # Send chart via WebSocket
+        intent = {
+            "type": "render_chart",
+            "chartConfig": chart_config,
+            "containerId": "dynamic-chart",
+            "title": title,
+            "description": description
+        }
+        
+        result = await emit_intent(intent)
+        
+        return {
+            "status": "success",
+            "chart_type": chart_type,
+            "data_query": data_query,
+            "spec": chart_data["spec"],
+            "title": title,
+            "intent_result": result
+        }
+        
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to create visualization: {str(e)}",
+            "chart_type": chart_type,
+            "data_query": data_query
+        }
 
 
-def generate_report(report_type: str, date_range: str = ""):
-    """Generate various types of reports using comprehensive analytics."""
-    with httpx.Client() as client:
-        if report_type == "daily_summary":
-            # Get comprehensive analytics summary
-            response = client.get(f"{API_BASE}/analytics/summary", timeout=10)
-            summary_data = response.json()
-            
-            return {
-                "report_type": report_type,
-                "data": {
-                    "date": "today",
-                    "customers": summary_data["customers"],
-                    "tickets": summary_data["tickets"], 
-                    "health_distribution": summary_data["health_distribution"],
-                    "recent_activity": summary_data["recent_activity"][:5]
-                }
+async def generate_report(report_type: str, date_range: str = ""):
+    """Generate various types of reports using comprehensive analytics.
+
+    Independent fetches run concurrently, identical ones are shared within the
+    run, and the result carries how long gathering took against the budget.
+    """
+    async with fetch_scope() as scope:
+        report = await _build_report(report_type)
+        report["timings"] = scope.report()
+        return report
+
+
+async def _build_report(report_type: str):
+    if report_type == "daily_summary":
+        # Get comprehensive analytics summary
+        summary_data = await get_json("/analytics/summary")
+        
+        return {
+            "report_type": report_type,
+            "data": {
+                "date": "today",
+                "customers": summary_data["customers"],
+                "tickets": summary_data["tickets"], 
+                "health_distribution": summary_data["health_distribution"],
+                "recent_activity": summary_data["recent_activity"][:5]
             }
+        }
+    
+    elif report_type == "customer_health":
+        # Health scores and open ticket counts come back in a single query
+        customers = await get_json("/customers/health")
+        health_data = []
         
-        elif report_type == "customer_health":
-            # Get detailed customer health analysis
-            customers = client.get(f"{API_BASE}/customers", timeout=10).json()
-            health_data = []
+        for customer in customers:
+            health_score = customer.get("health_score", 75)
             
-            for customer in customers:
-                # Use the actual health score from the database
-                health_score = customer.get("health_score", 75)
-                lifecycle_stage = customer.get("lifecycle_stage", "prospect")
-                mrr = customer.get("mrr", 0)
-                
-                if health_score >= 90:
-                    health_status = "Excellent"
-                elif health_score >= 75:
-                    health_status = "Good" 
-                elif health_score >= 60:
-                    health_status = "Fair"
-                else:
-                    health_status = "Needs Attention"
-                
-                # Get actual ticket count
-                open_tickets = client.get(
-                    f"{API_BASE}/tickets",
-                    params={"customer_id": customer["id"], "status": "open"},
-                    timeout=10
-                ).json()
-                
-                health_data.append({
-                    "customer": customer["name"],
-                    "health_score": health_score,
-                    "health_status": health_status,
-                    "lifecycle_stage": lifecycle_stage,
-                    "mrr": mrr,
-                    "open_tickets": len(open_tickets),
-                    "industry": customer.get("industry", "Unknown"),
-                    "plan_type": customer.get("plan_type", "Unknown"),
-                    "region": customer.get("region", "Unknown")
-                })
+            if health_score >= 90:
+                health_status = "Excellent"
+            elif health_score >= 75:
+                health_status = "Good" 
+            elif health_score >= 60:
+                health_status = "Fair"
+            else:
+                health_status = "Needs Attention"
             
-            return {
-                "report_type": report_type,
-                "data": health_data
-            }
+            health_data.append({
+                "customer": customer["name"],
+                "health_score": health_score,
+                "health_status": health_status,
+                "lifecycle_stage": customer.get("lifecycle_stage", "prospect"),
+                "mrr": customer.get("mrr", 0),
+                "open_tickets": customer.get("open_tickets", 0),
+                "industry": customer.get("industry", "Unknown"),
+                "plan_type": customer.get("plan_type", "Unknown"),
+                "region": customer.get("region", "Unknown")
+            })
         
-        elif report_type == "weekly_summary":
-            # Comprehensive weekly business report
-            summary = client.get(f"{API_BASE}/analytics/summary", timeout=10).json()
-            revenue = client.get(f"{API_BASE}/analytics/revenue", timeout=10).json()
-            support = client.get(f"{API_BASE}/analytics/support", timeout=10).json()
-            
-            return {
-                "report_type": report_type,
-                "data": {
-                    "period": "weekly",
-                    "customer_metrics": summary["customers"],
-                    "ticket_metrics": summary["tickets"],
-                    "revenue_analysis": revenue,
-                    "support_metrics": support,
-                    "key_insights": _generate_insights(summary, revenue, support)
-                }
-            }
+        return {
+            "report_type": report_type,
+            "data": health_data
+        }
+    
+    elif report_type == "weekly_summary":
+        # Comprehensive weekly business report
+        summary, revenue, support = await asyncio.gather(
+            get_json("/analytics/summary"),
+            get_json("/analytics/revenue"),
+            get_json("/analytics/support"),
+        )
         
-        elif report_type == "ticket_analysis":
-            # Detailed ticket analytics
-            support_data = client.get(f"{API_BASE}/analytics/support", timeout=10).json()
-            
-            return {
-                "report_type": report_type,
-                "data": {
-                    "ticket_distribution": support_data["ticket_matrix"],
-                    "team_performance": support_data["team_performance"],
-                    "sla_compliance": support_data["sla_compliance"],
-                    "recommendations": _generate_support_recommendations(support_data)
-                }
+        return {
+            "report_type": report_type,
+            "data": {
+                "period": "weekly",
+                "customer_metrics": summary["customers"],
+                "ticket_metrics": summary["tickets"],
+                "revenue_analysis": revenue,
+                "support_metrics": support,
+                "key_insights": _generate_insights(summary, revenue, support)
             }
+        }
+    
+    elif report_type == "ticket_analysis":
+        # Detailed ticket analytics
+        support_data = await get_json("/analytics/support")
         
         return {
             "report_type": report_type,
-            "data": f"Report type '{report_type}' not implemented yet"
+            "data": {
+                "ticket_distribution": support_data["ticket_matrix"],
+                "team_performance": support_data["team_performance"],
+                "sla_compliance": support_data["sla_compliance"],
+                "recommendations": _generate_support_recommendations(support_data)
+            }
         }
+    
+    return {
+        "report_type": report_type,
+        "data": f"Report type '{report_type}' not implemented yet"
+    }
 
 
 def _generate_insights(summary, revenue, support):
@@ -678,25 +521,26 @@ def _generate_support_recommendations(support_data):
     return recommendations
 
 
-# Workflow Engine
-workflow_state = {}
+# Workflow decisions and state (the engine itself lives in agent/workflows.py)
 
 
-def execute_workflow(workflow_name: str, context: dict = None):
-    """Execute a predefined multi-step workflow."""
-    context = context or {}
-    workflow_id = f"{workflow_name}_{hash(str(context))}"
-    
-    if workflow_name == "customer_onboarding":
-        return _customer_onboarding_workflow(workflow_id, context)
-    elif workflow_name == "ticket_escalation":
-        return _ticket_escalation_workflow(workflow_id, context)
-    elif workflow_name == "weekly_report":
-        return _weekly_report_workflow(workflow_id, context)
-    elif workflow_name == "customer_health_check":
-        return _customer_health_check_workflow(workflow_id, context)
-    
-    return {"error": f"Unknown workflow: {workflow_name}"}
+SLA_DECISION_REASONS = {
+    "escalate": "SLA breach risk detected",
+    "monitor": "Approaching SLA limit",
+    "continue": "Within SLA bounds",
+}
+
+
+def sla_critical_decisions(days_old: list, priorities: list) -> list:
+    """The sla_critical decision over whole columns of ticket ages and priorities."""
+    # "critical" ranks above "high" (see the ticket priority pattern), so it escalates too;
+    # matching only "high" would leave fresh critical tickets unescalated
+    return [
+        "escalate" if days > 7 or priority in ("high", "critical")
+        else "monitor" if days > 3
+        else "continue"
+        for days, priority in zip(days_old, priorities)
+    ]
 
 
 def workflow_decision(condition: str, data: dict = None, options: list = None):
@@ -717,15 +561,8 @@ def workflow_decision(condition: str, data: dict = None, options: list = None):
             return {"decision": "standard", "reason": "Standard customer profile"}
     
     elif "sla_critical" in condition.lower():
-        days_old = data.get("days_old", 0)
-        priority = data.get("priority", "normal")
-        
-        if days_old > 7 or priority == "high":
-            return {"decision": "escalate", "reason": "SLA breach risk detected"}
-        elif days_old > 3:
-            return {"decision": "monitor", "reason": "Approaching SLA limit"}
-        else:
-            return {"decision": "continue", "reason": "Within SLA bounds"}
+        (decision,) = sla_critical_decisions([data.get("days_old", 0)], [data.get("priority", "normal")])
+        return {"decision": decision, "reason": SLA_DECISION_REASONS[decision]}
     
     # Default decision
     if options:
@@ -734,281 +571,15 @@ def workflow_decision(condition: str, data: dict = None, options: list = None):
     return {"decision": "unknown", "reason": f"Could not evaluate condition: {condition}"}
 
 
-def set_workflow_state(key: str, value: dict):
+def set_workflow_state(key: str, value: dict, namespace: str = DEFAULT_NAMESPACE, ttl_seconds: float = None):
     """Store workflow state data."""
-    workflow_state[key] = value
-    return {"status": "stored", "key": key}
+    get_state_store().set(key, value, namespace=namespace, ttl=ttl_seconds)
+    return {"status": "stored", "key": key, "namespace": namespace}
 
 
-def get_workflow_state(key: str):
+def get_workflow_state(key: str, namespace: str = DEFAULT_NAMESPACE):
     """Retrieve workflow state data."""
-    return workflow_state.get(key, {})
-
-
-def _customer_onboarding_workflow(workflow_id: str, context: dict):
-    """Customer onboarding workflow with decision points."""
-    customer_name = context.get("customer_name", "Unknown Customer")
-    customer_email = context.get("customer_email", "")
-    
-    steps = []
-    
-    # Step 1: Create customer record
-    try:
-        customer_data = create_customer(customer_name, customer_email, "standard")
-        customer_id = customer_data.get("id", f"mock_{hash(customer_name)}")
-        steps.append(f"✓ Created customer record for {customer_name}")
-        
-        # Step 2: Decision point - check if high-value customer
-        decision_result = workflow_decision("high_value_check", {
-            "email": customer_email,
-            "ticket_count": 0
-        }, ["premium", "standard"])
-        
-        if decision_result["decision"] == "premium":
-            # Premium path
-            steps.append(f"✓ Identified as premium customer: {decision_result['reason']}")
-            schedule_followup(customer_id, 1, "call", "Welcome call for premium customer")
-            steps.append("✓ Scheduled premium welcome call within 24 hours")
-            
-            # Create priority ticket
-            create_note("onboarding_ticket", f"Premium onboarding for {customer_name} - expedited setup")
-            steps.append("✓ Created premium onboarding ticket")
-            
-        else:
-            # Standard path  
-            steps.append(f"✓ Processing as standard customer: {decision_result['reason']}")
-            send_email(customer_email, "Welcome to our service", f"Welcome {customer_name}! We'll be in touch soon.")
-            steps.append("✓ Sent welcome email")
-            
-            schedule_followup(customer_id, 3, "email", "Follow-up email for standard customer")
-            steps.append("✓ Scheduled follow-up email in 3 days")
-        
-        # Step 3: Schedule health check
-        schedule_followup(customer_id, 7, "check-in", "One week health check")
-        steps.append("✓ Scheduled 7-day health check")
-        
-        return {
-            "workflow": "customer_onboarding",
-            "status": "completed",
-            "customer_id": customer_id,
-            "steps": steps,
-            "path": decision_result["decision"]
-        }
-        
-    except Exception as e:
-        return {
-            "workflow": "customer_onboarding", 
-            "status": "error",
-            "error": str(e),
-            "steps": steps
-        }
-
-
-def _ticket_escalation_workflow(workflow_id: str, context: dict):
-    """Ticket escalation workflow with SLA checking."""
-    steps = []
-    escalated_count = 0
-    monitored_count = 0
-    
-    try:
-        # Get all customers and their tickets
-        customers_response = get_customer_stats("all")
-        customers = customers_response.get("ticket_counts", [])
-        
-        steps.append("✓ Retrieved customer ticket data")
-        
-        for customer_data in customers:
-            customer_name = customer_data["customer"]
-            
-            # Mock: Check tickets for this customer
-            tickets = list_tickets("mock_customer_id", "open")  # Simplified
-            
-            for i, ticket in enumerate(tickets[:2]):  # Limit for demo
-                # Mock SLA check
-                sla_result = check_sla_status(ticket.get("id", f"ticket_{i}"))
-                
-                decision = workflow_decision("sla_critical", {
-                    "days_old": sla_result.get("days_old", 0),
-                    "priority": ticket.get("priority", "normal")
-                })
-                
-                if decision["decision"] == "escalate":
-                    assign_ticket(ticket.get("id"), "manager")
-                    steps.append(f"🚨 Escalated ticket for {customer_name}: {decision['reason']}")
-                    escalated_count += 1
-                    
-                elif decision["decision"] == "monitor":
-                    assign_ticket(ticket.get("id"), "senior_support")  
-                    steps.append(f"⚠️  Monitoring ticket for {customer_name}: {decision['reason']}")
-                    monitored_count += 1
-                    
-                else:
-                    steps.append(f"✓ Ticket for {customer_name} within SLA")
-        
-        # Summary email
-        if escalated_count > 0 or monitored_count > 0:
-            summary = f"Escalation Summary: {escalated_count} escalated, {monitored_count} monitoring"
-            send_email("manager@company.com", "Ticket Escalation Report", summary)
-            steps.append("✓ Sent escalation summary to management")
-        
-        return {
-            "workflow": "ticket_escalation",
-            "status": "completed", 
-            "escalated_count": escalated_count,
-            "monitored_count": monitored_count,
-            "steps": steps
-        }
-        
-    except Exception as e:
-        return {
-            "workflow": "ticket_escalation",
-            "status": "error",
-            "error": str(e),
-            "steps": steps
-        }
-
-
-def _weekly_report_workflow(workflow_id: str, context: dict):
-    """Weekly report generation with trend analysis."""
-    steps = []
-    
-    try:
-        # Step 1: Gather metrics
-        daily_report = generate_report("daily_summary")
-        health_report = generate_report("customer_health") 
-        stats = get_customer_stats("all")
-        
-        steps.append("✓ Gathered business metrics")
-        
-        # Step 2: Analyze trends (mock trend detection)
-        daily_data = daily_report.get("data", {})
-        health_data = health_report.get("data", [])
-        
-        open_tickets = daily_data.get("open_tickets", 0)
-        total_customers = daily_data.get("total_customers", 0)
-        
-        # Decision point: Are there concerning trends?
-        decision = workflow_decision("trend_analysis", {
-            "open_ticket_ratio": open_tickets / max(total_customers, 1),
-            "unhealthy_customers": len([c for c in health_data if c.get("health_status") == "Needs Attention"])
-        })
-        
-        steps.append("✓ Analyzed trends and patterns")
-        
-        # Step 3: Generate recommendations based on analysis
-        recommendations = []
-        action_items = []
-        
-        if open_tickets > total_customers * 0.5:  # More than 0.5 tickets per customer
-            recommendations.append("High ticket volume detected - consider additional support staff")
-            action_items.append("Schedule team capacity review meeting")
-            
-        unhealthy_count = len([c for c in health_data if c.get("health_status") == "Needs Attention"])
-        if unhealthy_count > 0:
-            recommendations.append(f"{unhealthy_count} customers need immediate attention")
-            action_items.append("Review customer health issues with account managers")
-        
-        # Step 4: Compile comprehensive report
-        report_data = {
-            "period": "Weekly Report",
-            "metrics": daily_data,
-            "customer_health": health_data,
-            "recommendations": recommendations,
-            "action_items": action_items,
-            "generated_at": "now"
-        }
-        
-        steps.append("✓ Compiled comprehensive weekly report")
-        
-        # Step 5: Schedule actions if needed
-        if action_items:
-            for action in action_items:
-                schedule_followup("management", 1, "review", action)
-            steps.append(f"✓ Scheduled {len(action_items)} follow-up actions")
-        
-        # Step 6: Send report
-        report_summary = f"Weekly Report: {total_customers} customers, {open_tickets} open tickets"
-        if recommendations:
-            report_summary += f", {len(recommendations)} recommendations"
-            
-        send_email("team@company.com", "Weekly Business Report", report_summary)
-        steps.append("✓ Sent weekly report to team")
-        
-        return {
-            "workflow": "weekly_report",
-            "status": "completed",
-            "report_data": report_data,
-            "steps": steps
-        }
-        
-    except Exception as e:
-        return {
-            "workflow": "weekly_report",
-            "status": "error", 
-            "error": str(e),
-            "steps": steps
-        }
-
-
-def _customer_health_check_workflow(workflow_id: str, context: dict):
-    """Customer health check workflow with proactive actions."""
-    steps = []
-    actions_taken = 0
-    
-    try:
-        # Get customer health data
-        health_report = generate_report("customer_health")
-        health_data = health_report.get("data", [])
-        
-        steps.append("✓ Retrieved customer health data")
-        
-        for customer in health_data:
-            customer_name = customer["customer"]
-            health_status = customer["health_status"] 
-            open_tickets = customer["open_tickets"]
-            
-            # Decision point: What action to take based on health?
-            if health_status == "Needs Attention":
-                # Critical path
-                assign_ticket("priority_review", "manager")
-                schedule_followup("mock_id", 1, "call", f"Urgent review for {customer_name}")
-                steps.append(f"🚨 Critical: Scheduled urgent review for {customer_name}")
-                actions_taken += 1
-                
-            elif health_status == "Fair" and open_tickets > 3:
-                # Monitor path
-                schedule_followup("mock_id", 2, "check-in", f"Health check for {customer_name}")
-                steps.append(f"⚠️  Monitoring: Scheduled check-in for {customer_name}")
-                actions_taken += 1
-                
-            elif health_status == "Excellent":
-                # Success story path
-                steps.append(f"✅ {customer_name} showing excellent health")
-                
-            else:
-                steps.append(f"✓ {customer_name} health status: {health_status}")
-        
-        # Summary actions
-        if actions_taken > 0:
-            summary = f"Customer Health Summary: {actions_taken} proactive actions taken"
-            send_email("management@company.com", "Customer Health Alert", summary)
-            steps.append("✓ Sent health summary to management")
-        
-        return {
-            "workflow": "customer_health_check",
-            "status": "completed",
-            "actions_taken": actions_taken,
-            "health_summary": health_data,
-            "steps": steps
-        }
-        
-    except Exception as e:
-        return {
-            "workflow": "customer_health_check",
-            "status": "error",
-            "error": str(e),
-            "steps": steps
-        }
+    return get_state_store().get(key, namespace=namespace, default={})
 
 
 def create_customer(name: str, email: str = None, priority: str = "standard"):
@@ -1040,25 +611,93 @@ def schedule_followup(customer_id: str, days: int, task_type: str, description:
     }
 
 
-def check_sla_status(ticket_id: str):
+async def check_sla_status(ticket_id: str):
     """Check if a ticket is compliant with SLA requirements."""
-    # Mock SLA check
-    mock_age = hash(ticket_id) % 10  # Random age between 0-9 days
+    response = await api_get(f"/tickets/{ticket_id}/sla", timeout=10)
+    response.raise_for_status()
+    sla = response.json()
     
     return {
         "ticket_id": ticket_id,
-        "days_old": mock_age,
-        "sla_limit": 5,
-        "status": "compliant" if mock_age <= 5 else "breach_risk",
-        "urgency": "high" if mock_age > 7 else "normal"
+        "days_old": sla["days_old"],
+        "sla_limit": sla["resolution_target_hours"] // 24,
+        "sla_risk": sla["sla_risk"],
+        "status": "breached" if sla["sla_breach"] else "breach_risk" if sla["sla_risk"] >= 0.5 else "compliant",
+        "urgency": "high" if sla["sla_risk"] >= 1 else "normal"
     }
 
 
-def assign_ticket(ticket_id: str, assignee: str):
-    """Assign a ticket to a team member."""
+async def get_triage_queue(limit: int = 10, min_risk: float = 0.0):
+    """Fetch open tickets ranked by SLA breach risk."""
+    response = await api_get(
+        "/triage",
+        params={"limit": limit, "min_risk": min_risk},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_open_ticket_book():
+    """Fetch every open ticket's id, customer, priority, assignee and age, column-wise."""
+    response = await api_get("/tickets/open-book", timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_team():
+    """Active team members with their ids and roles."""
+    response = await api_get("/team", timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+# Bulk writes are split into requests of at most this many rows
+BULK_WRITE_CHUNK = 5000
+
+
+async def assign_tickets(assignments: list):
+    """Apply [{"ticket_id", "assigned_to"}] assignments in batched requests."""
+    updated = 0
+    for start in range(0, len(assignments), BULK_WRITE_CHUNK):
+        response = await api_post(
+            "/tickets/assign",
+            json={"assignments": assignments[start:start + BULK_WRITE_CHUNK]},
+            timeout=60,
+        )
+        response.raise_for_status()
+        updated += response.json()["updated"]
+    return {"requested": len(assignments), "updated": updated}
+
+
+async def create_notes(notes: list):
+    """Create [{"ticket_id", "body"}] notes in batched requests."""
+    for start in range(0, len(notes), BULK_WRITE_CHUNK):
+        response = await api_post(
+            "/notes/bulk",
+            json={"notes": notes[start:start + BULK_WRITE_CHUNK]},
+            timeout=60,
+        )
+        response.raise_for_status()
+    return {"created": len(notes)}
+
+
+async def assign_ticket(ticket_id: str, assignee: str):
+    """Assign a ticket to a team member, given by id, name or role."""
+    wanted = assignee.strip().lower()
+    team = await get_team()
+    member = next(
+        (m for m in team if wanted in (m["id"].lower(), m["name"].lower())), None
+    ) or next((m for m in team if m["role"].lower() == wanted), None)
+    if member is None:
+        known = ", ".join(f"{m['id']} ({m['name']}, {m['role']})" for m in team)
+        return {"ticket_id": ticket_id, "status": "error", "message": f"Unknown assignee {assignee}; team: {known}"}
+    assignee = member["id"]
+    result = await assign_tickets([{"ticket_id": ticket_id, "assigned_to": assignee}])
+    if not result["updated"]:
+        return {"ticket_id": ticket_id, "status": "error", "message": "Ticket not found"}
     return {
         "ticket_id": ticket_id,
         "assigned_to": assignee,
-        "assigned_at": "now",
         "status": "assigned"
     }
@@ -2,13 +2,46 @@
 # ABOUTME: Receives view intents from agent and broadcasts to connected frontend clients
 import asyncio
 import websockets
+import hmac
 import json
 import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.job_queue import JobQueue, JobQueueFull, RateLimiter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 connected_clients = set()
+# Connections that identified as the agent publisher; only their messages are relayed
+publishers = set()
+
+AGENT_WS_TOKEN = os.getenv("AGENT_WS_TOKEN", "")
+
+# Message types the agent sends: UI intents, tool logs and streaming events
+RELAYED_TYPES = frozenset(
+    (
+        "set_view",
+        "add_panel",
+        "remove_panel",
+        "add_component",
+        "render_chart",
+        "tool_call",
+        "tool_call_started",
+        "assistant_delta",
+        "assistant_done",
+        "tool_cache",
+        "context",
+        "tool_router",
+    )
+)
+
+# Workflows triggered by frontend events run here, off the receive loop
+job_queue = JobQueue()
+rate_limiter = RateLimiter()
 
 
 async def handle_client(websocket):
@@ -27,33 +60,97 @@ async def handle_client(websocket):
             msg_type = data.get("type")
             if msg_type == "event":
                 payload = data.get("payload", {})
+                if payload.get("type") == "workflow":
+                    await submit_workflow_job(websocket, payload)
+                    continue
                 try:
                     from agent.tools import tool_receive_event
 
-                    tool_receive_event(payload)
+                    await tool_receive_event(payload)
                 except Exception as e:
                     logger.error(f"Error dispatching event: {e}")
-            else:
+            elif msg_type == "hello":
+                if data.get("role") == "agent" and hmac.compare_digest(str(data.get("token", "")), AGENT_WS_TOKEN):
+                    publishers.add(websocket)
+                    logger.info("Agent publisher identified")
+                else:
+                    logger.warning("Rejected publisher hello with a wrong role or token")
+            elif websocket not in publishers:
                 logger.warning(f"Unknown message type: {msg_type}")
+            elif msg_type == "batch":
+                # The agent publisher coalesces bursts; clients still receive one message per frame
+                for item in data.get("messages", []):
+                    await relay(item, websocket)
+            else:
+                await relay(data, websocket)
 
     except websockets.exceptions.ConnectionClosed:
         pass
     finally:
         connected_clients.discard(websocket)
+        publishers.discard(websocket)
+        rate_limiter.forget(websocket)
         logger.info(f"Client disconnected. Total clients: {len(connected_clients)}")
 
 
-async def broadcast_intent(intent_data):
-    """Broadcast an intent to all connected clients."""
-    if not connected_clients:
+async def relay(intent_data, sender):
+    """Broadcast one publisher message, dropping types the agent never sends."""
+    msg_type = intent_data.get("type") if isinstance(intent_data, dict) else None
+    if msg_type not in RELAYED_TYPES:
+        logger.warning(f"Dropped publisher message of unknown type: {msg_type}")
+        return
+    await broadcast_intent(intent_data, exclude=sender)
+
+
+async def send_to(websocket, message: dict):
+    """Send to one client, ignoring clients that have gone away."""
+    try:
+        await websocket.send(json.dumps(message, default=str))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def submit_workflow_job(websocket, payload: dict):
+    """Queue an event-triggered workflow and acknowledge at once; progress goes to the submitter only."""
+    name = payload.get("name")
+    if not name:
+        await send_to(websocket, {"type": "job_rejected", "reason": "missing workflow name"})
+        return
+    if not rate_limiter.allow(websocket):
+        await send_to(websocket, {"type": "job_rejected", "name": name, "reason": "rate_limited"})
+        return
+
+    from agent.workflows import execute_workflow
+
+    async def run(progress):
+        return await execute_workflow(
+            name,
+            payload.get("context", {}),
+            run_id=payload.get("run_id"),
+            idempotency_key=payload.get("idempotency_key"),
+            on_progress=progress,
+        )
+
+    try:
+        job = job_queue.submit(name, run, lambda message: send_to(websocket, message))
+    except JobQueueFull as e:
+        await send_to(websocket, {"type": "job_rejected", "name": name, "reason": "queue_full", "message": str(e)})
+        return
+    await send_to(websocket, {"type": "job_accepted", "job_id": job["id"], "name": name, "position": job["position"]})
+
+
+async def broadcast_intent(intent_data, exclude=None):
+    """Broadcast an intent to all connected clients except the sender."""
+    recipients = [client for client in connected_clients if client is not exclude and client not in publishers]
+    if not recipients:
         logger.warning("No clients connected to broadcast intent")
         return
 
     message = json.dumps(intent_data)
-    logger.info(f"Broadcasting intent to {len(connected_clients)} clients: {message}")
+    logger.info(f"Broadcasting intent to {len(recipients)} clients: {message}")
 
     disconnected = set()
-    for client in connected_clients:
+    for client in recipients:
         try:
             await client.send(message)
         except websockets.exceptions.ConnectionClosed:
@@ -0,0 +1,193 @@
+# ABOUTME: Durable DAG workflow engine persisted through the backend workflow_runs/workflow_steps tables
+# ABOUTME: Runs independent steps concurrently and resumes interrupted runs from their recorded steps
+import asyncio
+import inspect
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from agent.tools import finish_workflow, get_workflow_run, record_workflow_step, start_workflow
+
+AGENT_WORKFLOW_CONCURRENCY = int(os.getenv("AGENT_WORKFLOW_CONCURRENCY", "4"))
+
+# Recorded step statuses a resumed run reuses instead of running the step again
+_REUSABLE = ("completed", "skipped")
+
+# Runs executing in this process; resuming one of these would run its steps twice
+_active_runs = set()
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    # fn(context, results) -> JSON-serializable result, sync or async. A "log" list in
+    # a dict result is surfaced as the run's human-readable step lines.
+    fn: Callable
+    after: tuple = ()
+    # Decision gate, evaluated on results once every dependency has finished; False skips the step
+    when: Optional[Callable] = None
+
+
+def decided(step_name: str, *decisions):
+    """Gate a step on the decision a decision node made."""
+    def gate(results):
+        outcome = results.get(step_name) or {}
+        return outcome.get("decision") in decisions
+    return gate
+
+
+class Workflow:
+    def __init__(self, name: str, steps: list, summarize: Optional[Callable] = None, share_fetches: bool = False):
+        self.name = name
+        self.steps = {step.name: step for step in steps}
+        # summarize(context, results) -> extra fields for the final result
+        self.summarize = summarize
+        # Read-only workflows let their steps share identical GETs for the whole run
+        self.share_fetches = share_fetches
+        if len(self.steps) != len(steps):
+            raise ValueError(f"Duplicate step names in workflow {name}")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        for step in self.steps.values():
+            for dep in step.after:
+                if dep not in self.steps:
+                    raise ValueError(f"Step {step.name} depends on unknown step {dep}")
+        ordered, remaining = set(), dict(self.steps)
+        while remaining:
+            ready = [name for name, step in remaining.items() if set(step.after) <= ordered]
+            if not ready:
+                raise ValueError(f"Workflow {self.name} has a dependency cycle through {sorted(remaining)}")
+            for name in ready:
+                ordered.add(name)
+                del remaining[name]
+
+
+async def _call(step: Step, context: dict, results: dict, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        outcome = step.fn(context, results)
+        if inspect.isawaitable(outcome):
+            outcome = await outcome
+        return outcome
+
+
+def _log_lines(result) -> list:
+    return list(result.get("log", [])) if isinstance(result, dict) else []
+
+
+async def run_workflow(
+    workflow: Workflow, context: dict, run_id: Optional[int] = None, on_progress: Optional[Callable] = None
+) -> dict:
+    """Run a workflow as a new persisted run, or resume run_id from its recorded steps.
+
+    on_progress, if given, is awaited with {"run_id", "step", "status", "log"} as each step finishes.
+    """
+    async def progress(name: str, status: str, result=None):
+        if on_progress is not None:
+            await on_progress({"run_id": run_id, "step": name, "status": status, "log": _log_lines(result)})
+
+    results, statuses, log = {}, {}, []
+
+    resuming = run_id is not None
+    if not resuming:
+        run = await start_workflow(workflow.name, json.dumps(context, sort_keys=True, default=str))
+        run_id = run["id"]
+    elif run_id in _active_runs:
+        return {"workflow": workflow.name, "run_id": run_id, "status": "error", "error": "Run is already executing"}
+    # Claimed before the next await, so a concurrent resume of the same run sees it as executing
+    _active_runs.add(run_id)
+    try:
+        if resuming:
+            run = await get_workflow_run(run_id)
+            if run["name"] != workflow.name:
+                raise ValueError(f"Run {run_id} belongs to workflow {run['name']}, not {workflow.name}")
+            if run["status"] == "completed":
+                return {**json.loads(run["result"] or "{}"), "run_id": run_id, "status": "completed", "resumed_steps": 0}
+            if run.get("context"):
+                context = json.loads(run["context"])
+            for step in run["steps"]:
+                if step["status"] in _REUSABLE and step["name"] in workflow.steps:
+                    statuses[step["name"]] = step["status"]
+                    results[step["name"]] = json.loads(step["result"]) if step["result"] else None
+                    log.extend(_log_lines(results[step["name"]]))
+        resumed = len(statuses)
+
+        try:
+            failure = await _run_steps(workflow, context, run_id, results, statuses, log, progress)
+            if failure is not None:
+                await finish_workflow(run_id, "failed", json.dumps({"error": failure}))
+                return {
+                    "workflow": workflow.name,
+                    "run_id": run_id,
+                    "status": "error",
+                    "error": failure,
+                    "steps": log,
+                    "resumed_steps": resumed,
+                }
+
+            summary = {
+                "workflow": workflow.name,
+                "status": "completed",
+                "steps": log,
+                **(workflow.summarize(context, results) if workflow.summarize else {}),
+            }
+            await finish_workflow(run_id, "completed", json.dumps(summary, default=str))
+        except BaseException as e:
+            # Recording a step can fail too (backend unreachable); never leave the run "running"
+            try:
+                await finish_workflow(run_id, "failed", json.dumps({"error": str(e) or type(e).__name__}))
+            except Exception as finish_error:
+                print(f"Could not mark workflow run {run_id} failed: {finish_error}")
+            raise
+        return {**summary, "run_id": run_id, "resumed_steps": resumed}
+    finally:
+        _active_runs.discard(run_id)
+
+
+async def _run_steps(workflow: Workflow, context: dict, run_id: int, results: dict, statuses: dict, log: list, progress):
+    """Schedule every step whose dependencies are done; returns the first failure, or None."""
+    semaphore = asyncio.Semaphore(AGENT_WORKFLOW_CONCURRENCY)
+    running = {}
+    failure = None
+    try:
+        while True:
+            # Skipping a step can unblock its dependents, so schedule until nothing changes
+            progressed = failure is None
+            while progressed:
+                progressed = False
+                for step in workflow.steps.values():
+                    if step.name in statuses or step.name in running.values():
+                        continue
+                    if not all(dep in statuses for dep in step.after):
+                        continue
+                    if step.when is not None and not step.when(results):
+                        statuses[step.name], results[step.name] = "skipped", None
+                        await record_workflow_step(run_id, step.name, "skipped")
+                        await progress(step.name, "skipped")
+                        progressed = True
+                        continue
+                    running[asyncio.create_task(_call(step, context, results, semaphore))] = step.name
+
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    statuses[name] = "failed"
+                    failure = failure or f"{name}: {e}"
+                    await record_workflow_step(run_id, name, "failed", json.dumps({"error": str(e)}))
+                    await progress(name, "failed", {"log": [f"✗ {name} failed: {e}"]})
+                    continue
+                statuses[name], results[name] = "completed", result
+                log.extend(_log_lines(result))
+                await record_workflow_step(run_id, name, "completed", json.dumps(result, default=str))
+                await progress(name, "completed", result)
+    except BaseException:
+        for task in running:
+            task.cancel()
+        raise
+    return failure
@@ -0,0 +1,490 @@
+# ABOUTME: Predefined business workflows declared as DAGs of steps and decision nodes
+# ABOUTME: Executed and persisted by the workflow engine; exposed to the agent as execute_workflow
+import asyncio
+import hashlib
+import json
+import os
+from typing import Optional
+
+from agent.fetch_scope import fetch_scope
+from agent.state_store import get_state_store
+from agent.tools import (
+    SLA_DECISION_REASONS,
+    assign_tickets,
+    create_customer,
+    create_note,
+    create_notes,
+    generate_report,
+    get_customer_stats,
+    get_open_ticket_book,
+    get_team,
+    schedule_followup,
+    send_email,
+    sla_critical_decisions,
+    workflow_decision,
+)
+from agent.workflow_engine import Step, Workflow, decided, run_workflow
+
+
+# Customer onboarding
+
+def _onboard_create_customer(context, results):
+    customer_name = context.get("customer_name", "Unknown Customer")
+    customer = create_customer(customer_name, context.get("customer_email", ""), "standard")
+    return {"customer": customer, "log": [f"✓ Created customer record for {customer_name}"]}
+
+
+def _onboard_classify(context, results):
+    decision = workflow_decision("high_value_check", {
+        "email": context.get("customer_email", ""),
+        "ticket_count": 0
+    }, ["premium", "standard"])
+    if decision["decision"] == "premium":
+        line = f"✓ Identified as premium customer: {decision['reason']}"
+    else:
+        line = f"✓ Processing as standard customer: {decision['reason']}"
+    return {**decision, "log": [line]}
+
+
+def _customer_id(results):
+    return results["create_customer"]["customer"]["id"]
+
+
+def _onboard_premium_call(context, results):
+    schedule_followup(_customer_id(results), 1, "call", "Welcome call for premium customer")
+    return {"log": ["✓ Scheduled premium welcome call within 24 hours"]}
+
+
+async def _onboard_premium_ticket(context, results):
+    customer_name = context.get("customer_name", "Unknown Customer")
+    await create_note("onboarding_ticket", f"Premium onboarding for {customer_name} - expedited setup")
+    return {"log": ["✓ Created premium onboarding ticket"]}
+
+
+async def _onboard_welcome_email(context, results):
+    customer_name = context.get("customer_name", "Unknown Customer")
+    await send_email(context.get("customer_email", ""), "Welcome to our service", f"Welcome {customer_name}! We'll be in touch soon.")
+    return {"log": ["✓ Sent welcome email"]}
+
+
+def _onboard_standard_followup(context, results):
+    schedule_followup(_customer_id(results), 3, "email", "Follow-up email for standard customer")
+    return {"log": ["✓ Scheduled follow-up email in 3 days"]}
+
+
+def _onboard_health_check(context, results):
+    schedule_followup(_customer_id(results), 7, "check-in", "One week health check")
+    return {"log": ["✓ Scheduled 7-day health check"]}
+
+
+CUSTOMER_ONBOARDING = Workflow(
+    "customer_onboarding",
+    [
+        Step("create_customer", _onboard_create_customer),
+        Step("classify", _onboard_classify, after=("create_customer",)),
+        Step("premium_call", _onboard_premium_call, after=("classify",), when=decided("classify", "premium")),
+        Step("premium_ticket", _onboard_premium_ticket, after=("classify",), when=decided("classify", "premium")),
+        Step("welcome_email", _onboard_welcome_email, after=("classify",), when=decided("classify", "standard")),
+        Step("standard_followup", _onboard_standard_followup, after=("classify",), when=decided("classify", "standard")),
+        # Independent of the premium/standard decision, so it runs alongside it
+        Step("health_check", _onboard_health_check, after=("create_customer",)),
+    ],
+    summarize=lambda context, results: {
+        "customer_id": _customer_id(results),
+        "path": results["classify"]["decision"],
+    },
+)
+
+
+# Ticket escalation
+
+# Team role that takes over a ticket of each sla_critical decision that needs action
+ESCALATION_ROLES = {"escalate": "Support Manager", "monitor": "Senior Support"}
+# Owners who keep a ticket under each decision; unassigned tickets and anyone else are reassigned
+ESCALATION_QUALIFIED_ROLES = {
+    "escalate": frozenset(("Support Manager", "Technical Lead", "Senior Support")),
+    "monitor": frozenset(("Support Manager", "Technical Lead", "Senior Support", "Support Specialist")),
+}
+# Per-ticket lines kept in the run log for each action; the rest are summarized
+ESCALATION_LOG_LIMIT = 25
+
+
+def _capped(lines: list, total: int) -> list:
+    if total > len(lines):
+        return lines + [f"… and {total - len(lines)} more"]
+    return lines
+
+
+async def _escalation_assess(context, results):
+    # One pass over the whole open book rather than a per-customer walk
+    book, team = await asyncio.gather(get_open_ticket_book(), get_team())
+    decisions = sla_critical_decisions(book["days_old"], book["priority"])
+
+    members = {member["id"]: member for member in team}
+    role_members = {}
+    for member in team:
+        role_members.setdefault(member["role"], []).append(member)
+    for role in ESCALATION_ROLES.values():
+        if not role_members.get(role):
+            raise ValueError(f"No active team member with role {role}")
+    # Open tickets each member holds; every new assignment goes to the least loaded member of the role
+    load = {member_id: 0 for member_id in members}
+    for assigned_to in book["assigned_to"]:
+        if assigned_to in load:
+            load[assigned_to] += 1
+
+    actions = {decision: [] for decision in ESCALATION_ROLES}
+    assignees = {}
+    already_assigned = 0
+    for ticket_id, customer_id, customer_name, assigned_to, decision in zip(
+        book["id"], book["customer_id"], book["customer_name"], book["assigned_to"], decisions
+    ):
+        role = ESCALATION_ROLES.get(decision)
+        if role is None:
+            continue
+        # A qualified owner keeps the ticket, and re-runs must not re-annotate it
+        owner = members.get(assigned_to)
+        if owner is not None and owner["role"] in ESCALATION_QUALIFIED_ROLES[decision]:
+            already_assigned += 1
+            continue
+        # /team is ordered by name, so ties go the same way on every run
+        member = min(role_members[role], key=lambda m: load[m["id"]])
+        load[member["id"]] += 1
+        assignees[member["id"]] = {"id": member["id"], "name": member["name"], "role": role}
+        actions[decision].append(
+            {"ticket_id": ticket_id, "customer_name": customer_name or customer_id, "assigned_to": member["id"]}
+        )
+
+    within_sla = decisions.count("continue")
+    return {
+        **actions,
+        "assignees": assignees,
+        "already_assigned": already_assigned,
+        "log": [
+            f"✓ Assessed {len(decisions)} open tickets: {len(actions['escalate'])} to escalate, "
+            f"{len(actions['monitor'])} to monitor, {within_sla} within SLA, "
+            f"{already_assigned} already with a qualified owner"
+        ],
+    }
+
+
+async def _apply_sla_action(results, decision: str, line):
+    tickets = results["assess"][decision]
+    assignees = results["assess"]["assignees"]
+    reason = SLA_DECISION_REASONS[decision]
+    await asyncio.gather(
+        assign_tickets([{"ticket_id": t["ticket_id"], "assigned_to": t["assigned_to"]} for t in tickets]),
+        create_notes([
+            {
+                "ticket_id": t["ticket_id"],
+                "body": (
+                    f"Assigned to {assignees[t['assigned_to']]['name']} ({assignees[t['assigned_to']]['role']}) "
+                    f"by SLA escalation: {reason}"
+                ),
+            }
+            for t in tickets
+        ]),
+    )
+    log = [line(t, reason) for t in tickets[:ESCALATION_LOG_LIMIT]]
+    return {"count": len(tickets), "log": _capped(log, len(tickets))}
+
+
+async def _escalation_escalate(context, results):
+    return await _apply_sla_action(
+        results, "escalate", lambda t, reason: f"🚨 Escalated {t['ticket_id']} for {t['customer_name']}: {reason}"
+    )
+
+
+async def _escalation_monitor(context, results):
+    return await _apply_sla_action(
+        results, "monitor", lambda t, reason: f"⚠️  Monitoring {t['ticket_id']} for {t['customer_name']}: {reason}"
+    )
+
+
+def _escalated_count(results) -> int:
+    return (results.get("escalate") or {}).get("count", 0)
+
+
+def _monitored_count(results) -> int:
+    return (results.get("monitor") or {}).get("count", 0)
+
+
+async def _escalation_notify(context, results):
+    summary = f"Escalation Summary: {_escalated_count(results)} escalated, {_monitored_count(results)} monitoring"
+    await send_email("manager@company.com", "Ticket Escalation Report", summary)
+    return {"log": ["✓ Sent escalation summary to management"]}
+
+
+TICKET_ESCALATION = Workflow(
+    "ticket_escalation",
+    [
+        Step("assess", _escalation_assess),
+        # Independent batches of writes, so they run side by side
+        Step("escalate", _escalation_escalate, after=("assess",),
+             when=lambda results: bool(results["assess"]["escalate"])),
+        Step("monitor", _escalation_monitor, after=("assess",),
+             when=lambda results: bool(results["assess"]["monitor"])),
+        Step("notify", _escalation_notify, after=("escalate", "monitor"),
+             when=lambda results: _escalated_count(results) + _monitored_count(results) > 0),
+    ],
+    summarize=lambda context, results: {
+        "escalated_count": _escalated_count(results),
+        "monitored_count": _monitored_count(results),
+    },
+)
+
+
+# Weekly report
+
+async def _weekly_daily(context, results):
+    report = await generate_report("daily_summary")
+    return {"data": report.get("data", {}), "log": ["✓ Gathered daily business metrics"]}
+
+
+async def _weekly_health(context, results):
+    report = await generate_report("customer_health")
+    return {"data": report.get("data", []), "log": ["✓ Gathered customer health metrics"]}
+
+
+async def _weekly_stats(context, results):
+    return {"data": await get_customer_stats("all"), "log": ["✓ Gathered customer statistics"]}
+
+
+def _weekly_analyze(context, results):
+    daily_data = results["daily"]["data"]
+    health_data = results["health"]["data"]
+    open_tickets = daily_data.get("open_tickets", 0)
+    total_customers = daily_data.get("total_customers", 0)
+    unhealthy_count = len([c for c in health_data if c.get("health_status") == "Needs Attention"])
+
+    # Decision point: Are there concerning trends?
+    decision = workflow_decision("trend_analysis", {
+        "open_ticket_ratio": open_tickets / max(total_customers, 1),
+        "unhealthy_customers": unhealthy_count
+    })
+
+    recommendations = []
+    action_items = []
+    if open_tickets > total_customers * 0.5:  # More than 0.5 tickets per customer
+        recommendations.append("High ticket volume detected - consider additional support staff")
+        action_items.append("Schedule team capacity review meeting")
+    if unhealthy_count > 0:
+        recommendations.append(f"{unhealthy_count} customers need immediate attention")
+        action_items.append("Review customer health issues with account managers")
+
+    return {
+        "decision": decision["decision"],
+        "recommendations": recommendations,
+        "action_items": action_items,
+        "log": ["✓ Analyzed trends and patterns"],
+    }
+
+
+def _weekly_compile(context, results):
+    report_data = {
+        "period": "Weekly Report",
+        "metrics": results["daily"]["data"],
+        "customer_health": results["health"]["data"],
+        "customer_stats": results["stats"]["data"],
+        "recommendations": results["analyze"]["recommendations"],
+        "action_items": results["analyze"]["action_items"],
+        "generated_at": "now"
+    }
+    return {"report_data": report_data, "log": ["✓ Compiled comprehensive weekly report"]}
+
+
+def _weekly_followups(context, results):
+    action_items = results["analyze"]["action_items"]
+    for action in action_items:
+        schedule_followup("management", 1, "review", action)
+    return {"log": [f"✓ Scheduled {len(action_items)} follow-up actions"]}
+
+
+async def _weekly_send(context, results):
+    daily_data = results["daily"]["data"]
+    report_summary = (
+        f"Weekly Report: {daily_data.get('total_customers', 0)} customers, "
+        f"{daily_data.get('open_tickets', 0)} open tickets"
+    )
+    recommendations = results["analyze"]["recommendations"]
+    if recommendations:
+        report_summary += f", {len(recommendations)} recommendations"
+    await send_email("team@company.com", "Weekly Business Report", report_summary)
+    return {"log": ["✓ Sent weekly report to team"]}
+
+
+WEEKLY_REPORT = Workflow(
+    "weekly_report",
+    [
+        # The three gathers are independent and run in parallel
+        Step("daily", _weekly_daily),
+        Step("health", _weekly_health),
+        Step("stats", _weekly_stats),
+        Step("analyze", _weekly_analyze, after=("daily", "health")),
+        Step("compile", _weekly_compile, after=("analyze", "stats")),
+        Step("followups", _weekly_followups, after=("analyze",),
+             when=lambda results: bool(results["analyze"]["action_items"])),
+        Step("send", _weekly_send, after=("compile",)),
+    ],
+    summarize=lambda context, results: {"report_data": results["compile"]["report_data"]},
+    share_fetches=True,
+)
+
+
+# Customer health check
+
+async def _health_fetch(context, results):
+    report = await generate_report("customer_health")
+    return {"data": report.get("data", []), "log": ["✓ Retrieved customer health data"]}
+
+
+def _health_triage(context, results):
+    critical, monitor, log = [], [], []
+    for customer in results["fetch"]["data"]:
+        customer_name = customer["customer"]
+        health_status = customer["health_status"]
+        if health_status == "Needs Attention":
+            critical.append(customer_name)
+        elif health_status == "Fair" and customer["open_tickets"] > 3:
+            monitor.append(customer_name)
+        elif health_status == "Excellent":
+            log.append(f"✅ {customer_name} showing excellent health")
+        else:
+            log.append(f"✓ {customer_name} health status: {health_status}")
+    return {"critical": critical, "monitor": monitor, "log": log}
+
+
+def _health_critical(context, results):
+    log = []
+    for customer_name in results["triage"]["critical"]:
+        schedule_followup("mock_id", 1, "call", f"Urgent review for {customer_name}")
+        log.append(f"🚨 Critical: Scheduled urgent review for {customer_name}")
+    return {"log": log}
+
+
+def _health_monitor(context, results):
+    log = []
+    for customer_name in results["triage"]["monitor"]:
+        schedule_followup("mock_id", 2, "check-in", f"Health check for {customer_name}")
+        log.append(f"⚠️  Monitoring: Scheduled check-in for {customer_name}")
+    return {"log": log}
+
+
+def _health_actions_taken(results) -> int:
+    triage = results.get("triage") or {}
+    return len(triage.get("critical", [])) + len(triage.get("monitor", []))
+
+
+async def _health_notify(context, results):
+    summary = f"Customer Health Summary: {_health_actions_taken(results)} proactive actions taken"
+    await send_email("management@company.com", "Customer Health Alert", summary)
+    return {"log": ["✓ Sent health summary to management"]}
+
+
+CUSTOMER_HEALTH_CHECK = Workflow(
+    "customer_health_check",
+    [
+        Step("fetch", _health_fetch),
+        Step("triage", _health_triage, after=("fetch",)),
+        Step("critical", _health_critical, after=("triage",),
+             when=lambda results: bool(results["triage"]["critical"])),
+        Step("monitor", _health_monitor, after=("triage",),
+             when=lambda results: bool(results["triage"]["monitor"])),
+        Step("notify", _health_notify, after=("critical", "monitor"),
+             when=lambda results: _health_actions_taken(results) > 0),
+    ],
+    summarize=lambda context, results: {
+        "actions_taken": _health_actions_taken(results),
+        "health_summary": results["fetch"]["data"],
+    },
+)
+
+
+WORKFLOWS = {
+    workflow.name: workflow
+    for workflow in (CUSTOMER_ONBOARDING, TICKET_ESCALATION, WEEKLY_REPORT, CUSTOMER_HEALTH_CHECK)
+}
+
+
+# Duplicate submissions of the same workflow and context within this window get the earlier result
+AGENT_WORKFLOW_DEDUP_SECONDS = float(os.getenv("AGENT_WORKFLOW_DEDUP_SECONDS", "600"))
+LEDGER_NAMESPACE = "workflow_ledger"
+
+# idempotency key -> task of the execution currently running for it
+_in_flight = {}
+
+
+def workflow_idempotency_key(workflow_name: str, context: dict) -> str:
+    """Stable across processes and key order, unlike hash(str(context))."""
+    canonical = json.dumps(
+        {"workflow": workflow_name, "context": context},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def _run(workflow: Workflow, context: dict, run_id: Optional[int], on_progress=None):
+    try:
+        if not workflow.share_fetches:
+            return await run_workflow(workflow, context, run_id=run_id, on_progress=on_progress)
+        async with fetch_scope() as scope:
+            result = await run_workflow(workflow, context, run_id=run_id, on_progress=on_progress)
+        return {**result, "timings": scope.report()}
+    except Exception as e:
+        return {"workflow": workflow.name, "status": "error", "error": str(e), "steps": []}
+
+
+async def _run_once(workflow: Workflow, context: dict, key: str, on_progress=None):
+    store = get_state_store()
+    entry = await asyncio.to_thread(store.get, key, LEDGER_NAMESPACE)
+    if entry and entry["status"] == "completed":
+        return {**entry["result"], "deduplicated": True}
+
+    # A failed earlier attempt is resumed, so steps that already ran (emails sent,
+    # follow-ups scheduled) are not repeated
+    result = await _run(workflow, context, entry["run_id"] if entry else None, on_progress)
+
+    if result.get("run_id") is not None:
+        await asyncio.to_thread(
+            store.set,
+            key,
+            {"run_id": result["run_id"], "status": result["status"], "result": result},
+            LEDGER_NAMESPACE,
+            AGENT_WORKFLOW_DEDUP_SECONDS,
+        )
+    return result
+
+
+async def execute_workflow(
+    workflow_name: str,
+    context: dict = None,
+    run_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+    on_progress=None,
+):
+    """Execute a predefined multi-step workflow, or resume an interrupted run by id.
+
+    Identical submissions share one execution while it runs and get its result
+    back for AGENT_WORKFLOW_DEDUP_SECONDS afterwards; only the submission that
+    started the execution receives on_progress step events.
+    """
+    workflow = WORKFLOWS.get(workflow_name)
+    if workflow is None:
+        return {"error": f"Unknown workflow: {workflow_name}"}
+    context = context or {}
+    if run_id is not None:
+        return await _run(workflow, context, run_id, on_progress)
+
+    key = idempotency_key or workflow_idempotency_key(workflow_name, context)
+    task = _in_flight.get(key)
+    if task is not None:
+        return {**await asyncio.shield(task), "deduplicated": True}
+
+    task = asyncio.ensure_future(_run_once(workflow, context, key, on_progress))
+    _in_flight[key] = task
+    task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    result = await asyncio.shield(task)
+    return {**result, "idempotency_key": key}
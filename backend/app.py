@@ -1,13 +1,27 @@
 # ABOUTME: FastAPI backend for the mini-CRM system
 # ABOUTME: Provides REST API endpoints for customers, tickets, notes, and emails
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional
+import asyncio
 import sqlite3
 import os
 import httpx
 
+from backend.archive import (
+    ARCHIVE_RETENTION_DAYS,
+    archive_closed_tickets,
+    partition_stats,
+    query_archived_notes,
+    query_archived_tickets,
+)
+from backend.charts import run_chart_query
+from backend.changes import init_changelog, latest_cursor, read_changes
+from backend.health import recompute_health_scores
+from backend.models import OPEN_TICKET_STATUSES
+from backend.sla import evaluate_open_tickets, init_sla_columns, open_ticket_book, ticket_sla, triage_queue
+
 app = FastAPI(title="MiniCRM", version="1.0.0")
 
 app.add_middleware(
@@ -38,10 +52,15 @@ def init_workflow_tables():
             status TEXT,
             started_at TEXT,
             finished_at TEXT,
-            result TEXT
+            result TEXT,
+            context TEXT
         )
         """
     )
+    # Runs created before resumable workflows have no stored context
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(workflow_runs)")}
+    if "context" not in columns:
+        conn.execute("ALTER TABLE workflow_runs ADD COLUMN context TEXT")
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS workflow_steps (
@@ -55,23 +74,52 @@ def init_workflow_tables():
         )
         """
     )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_steps_run ON workflow_steps(run_id)")
+    conn.commit()
+
+
+def init_customer_indexes():
+    """Indexes backing the structured /customers filters."""
+    conn = db()
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='customers'").fetchone():
+        return
+    for column in ("region", "industry", "plan_type", "lifecycle_stage"):
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_customers_{column} ON customers({column} COLLATE NOCASE)"
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_health_score ON customers(health_score)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_mrr ON customers(mrr)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_customer_status ON tickets(customer_id, status)")
     conn.commit()
 
 
 init_workflow_tables()
+init_customer_indexes()
+init_sla_columns(db())
+init_changelog(db())
+
+# Long-poll requests re-check the changelog at this interval
+CHANGES_POLL_SECONDS = 0.25
 
 
 class Customer(BaseModel):
     id: str
     name: str
     email: Optional[str] = None
+    industry: Optional[str] = None
+    plan_type: Optional[str] = None
+    region: Optional[str] = None
+    health_score: Optional[int] = None
+    mrr: Optional[float] = None
+    lifecycle_stage: Optional[str] = None
+    open_tickets: Optional[int] = None
 
 
 class Ticket(BaseModel):
     id: str
     customer_id: str
     title: str
-    status: str = Field(pattern="^(open|closed)$")
+    status: str = Field(pattern="^(open|in_progress|waiting_customer|resolved|closed)$")
     created_at: str
 
 
@@ -80,6 +128,20 @@ class NoteIn(BaseModel):
     body: str
 
 
+class NotesBulkIn(BaseModel):
+    notes: List[NoteIn]
+    author: str = "agent"
+
+
+class TicketAssignment(BaseModel):
+    ticket_id: str
+    assigned_to: str
+
+
+class TicketAssignmentsIn(BaseModel):
+    assignments: List[TicketAssignment]
+
+
 class Note(BaseModel):
     id: str
     ticket_id: str
@@ -95,15 +157,27 @@ class EmailIn(BaseModel):
 
 class ChatMessage(BaseModel):
     message: str
+    session_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     response: str
     view_change: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class ChartSpec(BaseModel):
+    entity: str = "tickets"
+    measure: str = "count"
+    dimension: Optional[str] = None
+    time_bucket: Optional[str] = None
+    filters: Optional[dict] = None
+    top_k: Optional[int] = None
 
 
 class WorkflowStart(BaseModel):
     name: str
+    context: Optional[str] = None
 
 
 class WorkflowRun(BaseModel):
@@ -113,6 +187,12 @@ class WorkflowRun(BaseModel):
     started_at: str
     finished_at: Optional[str] = None
     result: Optional[str] = None
+    context: Optional[str] = None
+
+
+class WorkflowFinish(BaseModel):
+    status: str = Field(pattern="^(completed|failed)$")
+    result: Optional[str] = None
 
 
 class WorkflowStepIn(BaseModel):
@@ -140,8 +220,8 @@ def rows(conn, q, args=()):
 def start_workflow(payload: WorkflowStart):
     conn = db()
     cur = conn.execute(
-        "INSERT INTO workflow_runs(name, status, started_at) VALUES(?, 'running', strftime('%Y-%m-%dT%H:%M:%SZ','now'))",
-        (payload.name,),
+        "INSERT INTO workflow_runs(name, status, started_at, context) VALUES(?, 'running', strftime('%Y-%m-%dT%H:%M:%SZ','now'), ?)",
+        (payload.name, payload.context),
     )
     conn.commit()
     run_id = cur.lastrowid
@@ -156,17 +236,27 @@ def add_workflow_step(run_id: int, step: WorkflowStepIn):
         "INSERT INTO workflow_steps(run_id, name, status, started_at, finished_at, result) VALUES(?,?,?,strftime('%Y-%m-%dT%H:%M:%SZ','now'), CASE WHEN ? IN ('completed','failed') THEN strftime('%Y-%m-%dT%H:%M:%SZ','now') END, ?)",
         (run_id, step.name, step.status, step.status, step.result),
     )
-    if step.status in ("completed", "failed"):
-        conn.execute(
-            "UPDATE workflow_runs SET status=?, finished_at=strftime('%Y-%m-%dT%H:%M:%SZ','now'), result=? WHERE id=?",
-            (step.status, step.result, run_id),
-        )
     conn.commit()
     step_id = cur.lastrowid
     (row,) = rows(conn, "SELECT * FROM workflow_steps WHERE id=?", (step_id,))
     return row
 
 
+@app.post("/workflows/{run_id}/finish", response_model=WorkflowRun)
+def finish_workflow(run_id: int, payload: WorkflowFinish):
+    """Close a run; step statuses alone never finish it since steps may run in parallel."""
+    conn = db()
+    cur = conn.execute(
+        "UPDATE workflow_runs SET status=?, finished_at=strftime('%Y-%m-%dT%H:%M:%SZ','now'), result=? WHERE id=?",
+        (payload.status, payload.result, run_id),
+    )
+    if cur.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    conn.commit()
+    (run,) = rows(conn, "SELECT * FROM workflow_runs WHERE id=?", (run_id,))
+    return run
+
+
 @app.get("/workflows/{run_id}")
 def get_workflow(run_id: int):
     conn = db()
@@ -180,41 +270,170 @@ def get_workflow(run_id: int):
 
 
 @app.get("/workflows", response_model=List[WorkflowRun])
-def list_workflows(limit: int = 20):
+def list_workflows(limit: int = 20, status: Optional[str] = None, name: Optional[str] = None):
     conn = db()
+    clauses, args = [], []
+    if status:
+        clauses.append("status = ?")
+        args.append(status)
+    if name:
+        clauses.append("name = ?")
+        args.append(name)
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
     return rows(
         conn,
-        "SELECT * FROM workflow_runs ORDER BY started_at DESC LIMIT ?",
-        (limit,),
+        f"SELECT * FROM workflow_runs {where}ORDER BY started_at DESC LIMIT ?",
+        (*args, limit),
     )
 
 
 @app.get("/customers", response_model=List[Customer])
-def list_customers(name: Optional[str] = None):
+def list_customers(
+    name: Optional[str] = None,
+    region: Optional[str] = None,
+    industry: Optional[str] = None,
+    plan_type: Optional[str] = None,
+    lifecycle_stage: Optional[str] = None,
+    min_health: Optional[int] = None,
+    max_health: Optional[int] = None,
+    min_mrr: Optional[float] = None,
+    max_mrr: Optional[float] = None,
+    min_open_tickets: Optional[int] = None,
+):
     conn = db()
+    clauses, args = [], []
     if name:
-        return rows(
-            conn,
-            "SELECT * FROM customers WHERE name LIKE ? ORDER BY name",
-            (f"%{name}%",),
+        clauses.append("c.name LIKE ?")
+        args.append(f"%{name}%")
+    for column, value in (
+        ("region", region),
+        ("industry", industry),
+        ("plan_type", plan_type),
+        ("lifecycle_stage", lifecycle_stage),
+    ):
+        if value:
+            clauses.append(f"c.{column} = ? COLLATE NOCASE")
+            args.append(value)
+    for condition, value in (
+        ("c.health_score >= ?", min_health),
+        ("c.health_score <= ?", max_health),
+        ("c.mrr >= ?", min_mrr),
+        ("c.mrr <= ?", max_mrr),
+    ):
+        if value is not None:
+            clauses.append(condition)
+            args.append(value)
+
+    select = "SELECT c.*"
+    if min_open_tickets is not None:
+        # Correlated count over the (customer_id, status) index, only when asked for
+        open_list = ",".join("?" for _ in OPEN_TICKET_STATUSES)
+        select += (
+            f", (SELECT COUNT(*) FROM tickets t WHERE t.customer_id = c.id"
+            f" AND t.status IN ({open_list})) AS open_tickets"
         )
-    return rows(conn, "SELECT * FROM customers ORDER BY name")
+        args = list(OPEN_TICKET_STATUSES) + args
+        clauses.append("open_tickets >= ?")
+        args.append(min_open_tickets)
+
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return rows(conn, f"{select} FROM customers c{where} ORDER BY c.name", args)
+
+
+@app.get("/customers/health", response_model=List[dict])
+def list_customer_health():
+    conn = db()
+    open_list = ",".join("?" for _ in OPEN_TICKET_STATUSES)
+    return rows(
+        conn,
+        f"""
+        SELECT c.id, c.name, c.health_score, c.lifecycle_stage, c.mrr,
+               c.industry, c.plan_type, c.region,
+               COUNT(t.id) AS open_tickets
+          FROM customers c
+          LEFT JOIN tickets t ON t.customer_id = c.id AND t.status IN ({open_list})
+         GROUP BY c.id
+         ORDER BY c.name
+        """,
+        OPEN_TICKET_STATUSES,
+    )
+
+
+@app.post("/customers/health/recompute")
+def recompute_customer_health(incremental: bool = False):
+    return recompute_health_scores(incremental=incremental)
 
 
 @app.get("/tickets", response_model=List[Ticket])
-def list_tickets(customer_id: str, status: Optional[str] = None):
+def list_tickets(customer_id: str, status: Optional[str] = None, include_archived: bool = False):
     conn = db()
     if status:
-        return rows(
+        tickets = rows(
             conn,
             "SELECT * FROM tickets WHERE customer_id=? AND status=? ORDER BY created_at",
             (customer_id, status),
         )
-    return rows(
-        conn,
-        "SELECT * FROM tickets WHERE customer_id=? ORDER BY created_at",
-        (customer_id,),
+    else:
+        tickets = rows(
+            conn,
+            "SELECT * FROM tickets WHERE customer_id=? ORDER BY created_at",
+            (customer_id,),
+        )
+    if include_archived:
+        hot_ids = {t["id"] for t in tickets}
+        archived = [
+            t for t in query_archived_tickets(customer_id, status) if t["id"] not in hot_ids
+        ]
+        tickets = sorted(tickets + archived, key=lambda t: t["created_at"])
+    return tickets
+
+
+@app.get("/triage", response_model=List[dict])
+def get_triage_queue(limit: int = 10, min_risk: float = 0.0):
+    return triage_queue(limit=limit, min_risk=min_risk)
+
+
+@app.get("/tickets/open-book")
+def get_open_ticket_book():
+    return open_ticket_book()
+
+
+@app.post("/tickets/assign")
+def assign_tickets(payload: TicketAssignmentsIn):
+    """Apply many assignments in one transaction; every assignee must be an active team member."""
+    conn = db()
+    assignees = sorted({a.assigned_to for a in payload.assignments})
+    if assignees:
+        placeholders = ",".join("?" for _ in assignees)
+        known = {
+            r["id"]
+            for r in rows(conn, f"SELECT id FROM team_members WHERE active = 1 AND id IN ({placeholders})", assignees)
+        }
+        unknown = [a for a in assignees if a not in known]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail={"error_code": "UNKNOWN_ASSIGNEE", "message": f"Not active team members: {', '.join(unknown)}"},
+            )
+    cur = conn.executemany(
+        "UPDATE tickets SET assigned_to=?, updated_at=strftime('%Y-%m-%dT%H:%M:%SZ','now') WHERE id=?",
+        [(a.assigned_to, a.ticket_id) for a in payload.assignments],
     )
+    conn.commit()
+    return {"requested": len(payload.assignments), "updated": cur.rowcount}
+
+
+@app.post("/sla/evaluate")
+def run_sla_evaluation():
+    return evaluate_open_tickets()
+
+
+@app.get("/tickets/{ticket_id}/sla")
+def get_ticket_sla(ticket_id: str):
+    result = ticket_sla(ticket_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return result
 
 
 @app.post("/notes", response_model=Note)
@@ -238,6 +457,23 @@ def create_note(note: NoteIn):
     return row
 
 
+@app.post("/notes/bulk")
+def create_notes(payload: NotesBulkIn):
+    """Insert many notes in one transaction."""
+    if any(not note.ticket_id for note in payload.notes):
+        raise HTTPException(
+            status_code=400,
+            detail={"error_code": "MISSING_FIELD", "message": "ticket_id required"},
+        )
+    conn = db()
+    conn.executemany(
+        "INSERT INTO notes(ticket_id, body, author, created_at) VALUES(?,?,?,strftime('%Y-%m-%dT%H:%M:%SZ','now'))",
+        [(note.ticket_id, note.body, payload.author) for note in payload.notes],
+    )
+    conn.commit()
+    return {"created": len(payload.notes)}
+
+
 @app.post("/emails")
 def send_email(payload: EmailIn):
     return {"status": "sent", "to": payload.to, "subject": payload.subject}
@@ -250,7 +486,7 @@ async def chat(message: ChatMessage):
         async with httpx.AsyncClient() as client:
             response = await client.post(
                 f"{AGENT_API_BASE}/process",
-                json={"message": message.message},
+                json={"message": message.message, "session_id": message.session_id},
                 timeout=30,
             )
             if response.status_code == 200:
@@ -258,6 +494,7 @@ async def chat(message: ChatMessage):
                 return ChatResponse(
                     response=agent_response.get("response", "Task completed"),
                     view_change=agent_response.get("view_change"),
+                    session_id=agent_response.get("session_id"),
                 )
             else:
                 raise HTTPException(status_code=500, detail="Agent request failed")
@@ -301,13 +538,28 @@ def get_customer_interactions(customer_id: str):
 
 
 @app.get("/tickets/{ticket_id}/notes", response_model=List[dict])
-def get_ticket_notes(ticket_id: str):
+def get_ticket_notes(ticket_id: str, include_archived: bool = False):
     conn = db()
-    return rows(
+    notes = rows(
         conn,
         "SELECT * FROM notes WHERE ticket_id = ? ORDER BY created_at ASC",
         (ticket_id,)
     )
+    if include_archived:
+        hot_ids = {n["id"] for n in notes}
+        archived = [n for n in query_archived_notes(ticket_id) if n["id"] not in hot_ids]
+        notes = sorted(notes + archived, key=lambda n: n["created_at"])
+    return notes
+
+
+@app.post("/archive/run")
+def run_archive(retention_days: int = ARCHIVE_RETENTION_DAYS, vacuum: bool = True):
+    return archive_closed_tickets(retention_days=retention_days, vacuum=vacuum)
+
+
+@app.get("/archive/partitions", response_model=List[dict])
+def list_archive_partitions():
+    return partition_stats()
 
 
 @app.get("/analytics/summary")
@@ -465,6 +717,48 @@ def get_support_analytics():
     }
 
 
+@app.post("/charts/query")
+def query_chart(spec: ChartSpec):
+    try:
+        return run_chart_query(db(), spec.model_dump())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error_code": "INVALID_CHART_SPEC", "message": str(e)},
+        )
+
+
+@app.get("/changes")
+async def get_changes(
+    since: int = 0,
+    limit: int = 500,
+    wait: float = Query(0, ge=0, le=30),
+    tables: Optional[str] = None,
+):
+    """Return row-level deltas after `since`; with `wait`, block until changes arrive or it expires."""
+    table_filter = tables.split(",") if tables else None
+    deadline = asyncio.get_running_loop().time() + wait
+    while True:
+        # sqlite reads block, so they run on a worker thread and the event loop stays free while polling
+        result = await asyncio.to_thread(_read_changes, since, limit, table_filter)
+        if result["changes"] or result["resync_required"] or asyncio.get_running_loop().time() >= deadline:
+            return result
+        await asyncio.sleep(CHANGES_POLL_SECONDS)
+
+
+def _read_changes(since: int, limit: int, tables):
+    conn = db()
+    try:
+        return read_changes(conn, since, limit, tables)
+    finally:
+        conn.close()
+
+
+@app.get("/changes/cursor")
+def get_changes_cursor():
+    return {"cursor": latest_cursor(db())}
+
+
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
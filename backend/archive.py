@@ -0,0 +1,242 @@
+# ABOUTME: Cold archival of closed tickets into compressed, month-partitioned SQLite files
+# ABOUTME: Moves old resolved/closed tickets and their notes out of the hot tables and reads them back on demand
+import glob
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+from backend.models import CLOSED_TICKET_STATUSES
+
+DB_PATH = os.getenv("DB_PATH", "backend/db.sqlite3")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "backend/archive")
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+
+TICKET_COLUMNS = (
+    "id",
+    "customer_id",
+    "title",
+    "description",
+    "status",
+    "priority",
+    "category",
+    "assigned_to",
+    "created_at",
+    "updated_at",
+    "resolved_at",
+    "first_response_at",
+    "sla_breach",
+    "satisfaction_rating",
+)
+NOTE_COLUMNS = ("id", "ticket_id", "body", "author", "note_type", "created_at")
+
+# Large free-text columns are stored zlib-compressed inside the partitions
+COMPRESSED_COLUMNS = {"description", "body"}
+
+
+def _compress(value):
+    if value is None:
+        return None
+    return zlib.compress(value.encode("utf-8"), 9)
+
+
+def _inflate(value):
+    if value is None:
+        return None
+    return zlib.decompress(value).decode("utf-8")
+
+
+def partition_path(partition: str) -> str:
+    """Return the archive file for a partition key such as '2025_07'."""
+    return os.path.join(ARCHIVE_DIR, f"tickets_{partition}.sqlite3")
+
+
+def list_partitions():
+    """Return the partition keys currently on disk, oldest first."""
+    paths = sorted(glob.glob(os.path.join(ARCHIVE_DIR, "tickets_*.sqlite3")))
+    return [os.path.basename(p)[len("tickets_"):-len(".sqlite3")] for p in paths]
+
+
+def _partition_key(ticket: dict) -> str:
+    closed_at = ticket["resolved_at"] or ticket["updated_at"] or ticket["created_at"]
+    return closed_at[:7].replace("-", "_")
+
+
+def _open_partition(partition: str):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    conn = sqlite3.connect(partition_path(partition))
+    conn.row_factory = sqlite3.Row
+    conn.create_function("inflate", 1, _inflate, deterministic=True)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tickets (
+            id TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description BLOB,
+            status TEXT,
+            priority TEXT,
+            category TEXT,
+            assigned_to TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT,
+            resolved_at TEXT,
+            first_response_at TEXT,
+            sla_breach BOOLEAN,
+            satisfaction_rating INTEGER
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY,
+            ticket_id TEXT NOT NULL,
+            body BLOB NOT NULL,
+            author TEXT,
+            note_type TEXT,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_customer ON tickets(customer_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_ticket ON notes(ticket_id)")
+    return conn
+
+
+def _select_list(columns):
+    return ", ".join(f"inflate({c}) AS {c}" if c in COMPRESSED_COLUMNS else c for c in columns)
+
+
+def _pack(row: dict, columns):
+    return tuple(_compress(row[c]) if c in COMPRESSED_COLUMNS else row[c] for c in columns)
+
+
+def archive_closed_tickets(retention_days: int = ARCHIVE_RETENTION_DAYS, vacuum: bool = True, now: datetime = None):
+    """Move tickets closed for longer than the retention window into archive partitions.
+
+    Tickets and their notes are written to the partition for the month they
+    were closed in, then removed from the hot tables in a single transaction.
+    Re-running after an interruption is safe: partition writes are upserts.
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).isoformat()
+    placeholders = ",".join("?" for _ in CLOSED_TICKET_STATUSES)
+
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    tickets = [
+        dict(r)
+        for r in conn.execute(
+            f"SELECT {', '.join(TICKET_COLUMNS)} FROM tickets "
+            f"WHERE status IN ({placeholders}) AND COALESCE(resolved_at, updated_at, created_at) < ?",
+            (*CLOSED_TICKET_STATUSES, cutoff),
+        )
+    ]
+    if not tickets:
+        conn.close()
+        return {"archived_tickets": 0, "archived_notes": 0, "partitions": [], "cutoff": cutoff}
+
+    by_partition = {}
+    for ticket in tickets:
+        by_partition.setdefault(_partition_key(ticket), []).append(ticket)
+
+    archived_notes = 0
+    for partition, batch in sorted(by_partition.items()):
+        ids = [t["id"] for t in batch]
+        notes = [
+            dict(r)
+            for r in conn.execute(
+                f"SELECT {', '.join(NOTE_COLUMNS)} FROM notes WHERE ticket_id IN ({','.join('?' for _ in ids)})",
+                ids,
+            )
+        ]
+        archive = _open_partition(partition)
+        with archive:
+            archive.executemany(
+                f"INSERT OR REPLACE INTO tickets ({', '.join(TICKET_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in TICKET_COLUMNS)})",
+                [_pack(t, TICKET_COLUMNS) for t in batch],
+            )
+            archive.executemany(
+                f"INSERT OR REPLACE INTO notes ({', '.join(NOTE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in NOTE_COLUMNS)})",
+                [_pack(n, NOTE_COLUMNS) for n in notes],
+            )
+        archive.execute("VACUUM")
+        archive.close()
+        archived_notes += len(notes)
+
+    ids = [t["id"] for t in tickets]
+    with conn:
+        conn.executemany("DELETE FROM notes WHERE ticket_id = ?", [(i,) for i in ids])
+        conn.executemany("DELETE FROM tickets WHERE id = ?", [(i,) for i in ids])
+    if vacuum:
+        conn.execute("VACUUM")
+    conn.close()
+
+    return {
+        "archived_tickets": len(tickets),
+        "archived_notes": archived_notes,
+        "partitions": sorted(by_partition),
+        "cutoff": cutoff,
+    }
+
+
+def query_archived_tickets(customer_id: str = None, status: str = None):
+    """Return archived tickets matching the filters across all partitions."""
+    clauses, args = [], []
+    if customer_id:
+        clauses.append("customer_id = ?")
+        args.append(customer_id)
+    if status:
+        clauses.append("status = ?")
+        args.append(status)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    results = []
+    for partition in list_partitions():
+        archive = _open_partition(partition)
+        results.extend(
+            dict(r)
+            for r in archive.execute(f"SELECT {_select_list(TICKET_COLUMNS)} FROM tickets{where}", args)
+        )
+        archive.close()
+    return results
+
+
+def query_archived_notes(ticket_id: str):
+    """Return archived notes for a ticket across all partitions."""
+    results = []
+    for partition in list_partitions():
+        archive = _open_partition(partition)
+        results.extend(
+            dict(r)
+            for r in archive.execute(
+                f"SELECT {_select_list(NOTE_COLUMNS)} FROM notes WHERE ticket_id = ?", (ticket_id,)
+            )
+        )
+        archive.close()
+    return results
+
+
+def partition_stats():
+    """Summarize each partition's row counts and on-disk size."""
+    stats = []
+    for partition in list_partitions():
+        archive = _open_partition(partition)
+        (tickets,) = archive.execute("SELECT COUNT(*) FROM tickets").fetchone()
+        (notes,) = archive.execute("SELECT COUNT(*) FROM notes").fetchone()
+        archive.close()
+        stats.append(
+            {
+                "partition": partition,
+                "tickets": tickets,
+                "notes": notes,
+                "bytes": os.path.getsize(partition_path(partition)),
+            }
+        )
+    return stats
+
+
+if __name__ == "__main__":
+    print(archive_closed_tickets())
@@ -0,0 +1,159 @@
+# ABOUTME: Change-data-capture for the CRM tables via SQLite triggers
+# ABOUTME: Records row-level deltas in a changelog table that clients read incrementally by cursor
+import json
+import os
+
+CAPTURED_TABLES = (
+    "customers",
+    "tickets",
+    "notes",
+    "interactions",
+    "workflow_runs",
+    "workflow_steps",
+)
+
+# Derived columns that are recomputed continuously and would only add churn
+UNCAPTURED_COLUMNS = {"tickets": {"sla_risk"}}
+
+# Entries older than this are pruned at startup; clients behind the horizon must resync
+CHANGELOG_RETENTION_DAYS = int(os.getenv("CHANGELOG_RETENTION_DAYS", "7"))
+
+# json_remove() ignores paths that do not exist, so unchanged columns map to this
+_NO_PATH = "$.__unchanged__"
+
+
+def _columns(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _install_triggers(conn, table, columns):
+    full_row = "json_object(" + ", ".join(f"'{c}', NEW.{c}" for c in columns) + ")"
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in columns)
+    # Updates only carry the id plus the columns that actually changed
+    delta = (
+        f"json_remove({full_row}, "
+        + ", ".join(
+            f"CASE WHEN OLD.{c} IS NEW.{c} THEN '$.{c}' ELSE '{_NO_PATH}' END"
+            for c in columns
+            if c != "id"
+        )
+        + ")"
+    )
+
+    for op in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS changelog_{table}_{op}")
+    conn.execute(
+        f"""
+        CREATE TRIGGER changelog_{table}_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO changelog (table_name, row_id, op, data) VALUES ('{table}', NEW.id, 'insert', {full_row});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER changelog_{table}_update AFTER UPDATE ON {table}
+        WHEN {changed}
+        BEGIN
+            INSERT INTO changelog (table_name, row_id, op, data) VALUES ('{table}', NEW.id, 'update', {delta});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER changelog_{table}_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO changelog (table_name, row_id, op) VALUES ('{table}', OLD.id, 'delete');
+        END
+        """
+    )
+
+
+def init_changelog(conn):
+    """Create the changelog table and (re)install capture triggers on every tracked table.
+
+    Triggers are rebuilt each time so they pick up columns added by later migrations.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            data TEXT,
+            changed_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now'))
+        )
+        """
+    )
+    # Highest seq ever pruned, so a cursor behind it is detected even once the table is empty
+    conn.execute("CREATE TABLE IF NOT EXISTS changelog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    for table in CAPTURED_TABLES:
+        skip = UNCAPTURED_COLUMNS.get(table, set())
+        columns = [c for c in _columns(conn, table) if c not in skip]
+        if columns:
+            _install_triggers(conn, table, columns)
+    cutoff = (f"-{CHANGELOG_RETENTION_DAYS} days",)
+    conn.execute(
+        """
+        INSERT INTO changelog_meta (key, value)
+        SELECT 'pruned_through', MAX(seq) FROM changelog
+         WHERE changed_at < strftime('%Y-%m-%dT%H:%M:%SZ','now', ?)
+        HAVING MAX(seq) IS NOT NULL
+        ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+        """,
+        cutoff,
+    )
+    conn.execute("DELETE FROM changelog WHERE changed_at < strftime('%Y-%m-%dT%H:%M:%SZ','now', ?)", cutoff)
+    conn.commit()
+
+
+def pruned_through(conn) -> int:
+    row = conn.execute("SELECT value FROM changelog_meta WHERE key = 'pruned_through'").fetchone()
+    return row[0] if row else 0
+
+
+def latest_cursor(conn) -> int:
+    # A fully pruned changelog is empty, but its head is still the last pruned seq
+    (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog").fetchone()
+    return max(seq, pruned_through(conn))
+
+
+def read_changes(conn, since: int, limit: int = 500, tables=None):
+    """Return changes after `since` as compact deltas plus the cursor to resume from.
+
+    `resync_required` is set when the client's cursor cannot be continued: it is
+    behind the pruned horizon, or ahead of the head (the database was reset or
+    reseeded). The client should reload and resume from the returned cursor.
+    """
+    (oldest,) = conn.execute("SELECT MIN(seq) FROM changelog").fetchone()
+    head = latest_cursor(conn)
+    if since > head:
+        return {"cursor": head, "changes": [], "has_more": False, "resync_required": True}
+    query = "SELECT seq, table_name, row_id, op, data FROM changelog WHERE seq > ? AND seq <= ?"
+    args = [since, head]
+    if tables:
+        query += f" AND table_name IN ({','.join('?' for _ in tables)})"
+        args.extend(tables)
+    query += " ORDER BY seq LIMIT ?"
+    args.append(limit + 1)
+
+    fetched = conn.execute(query, args).fetchall()
+    has_more = len(fetched) > limit
+    fetched = fetched[:limit]
+
+    changes = []
+    for seq, table, row_id, op, data in fetched:
+        change = {"seq": seq, "table": table, "id": row_id, "op": op}
+        if data is not None:
+            change["data"] = json.loads(data)
+        changes.append(change)
+
+    return {
+        # Once everything up to `head` has been returned, filtered reads can skip past
+        # other tables' entries too
+        "cursor": changes[-1]["seq"] if has_more else max(since, head),
+        "changes": changes,
+        "has_more": has_more,
+        "resync_required": since < pruned_through(conn) or (oldest is not None and since < oldest - 1),
+    }
@@ -0,0 +1,189 @@
+# ABOUTME: Declarative chart data engine: compiles a small chart spec into one aggregate SQL query
+# ABOUTME: Results are cached per spec and invalidated whenever the changelog cursor moves
+import json
+import threading
+from collections import OrderedDict
+
+from backend.changes import latest_cursor
+from backend.models import OPEN_TICKET_STATUSES
+
+_OPEN_LIST = ",".join(f"'{s}'" for s in OPEN_TICKET_STATUSES)
+
+_HEALTH_BAND = """CASE
+    WHEN c.health_score >= 90 THEN 'Excellent'
+    WHEN c.health_score >= 75 THEN 'Good'
+    WHEN c.health_score >= 60 THEN 'Fair'
+    ELSE 'Poor' END"""
+
+# Every identifier that can reach SQL comes from these tables, never from the spec itself
+ENTITIES = {
+    "tickets": {
+        "source": "tickets t LEFT JOIN customers c ON c.id = t.customer_id",
+        "time": "t.created_at",
+        "dimensions": {
+            "customer": "c.name",
+            "customer_id": "t.customer_id",
+            "status": "t.status",
+            "priority": "t.priority",
+            "category": "t.category",
+            "assignee": "t.assigned_to",
+            "region": "c.region",
+            "industry": "c.industry",
+            "plan_type": "c.plan_type",
+        },
+        "measures": {
+            "count": "COUNT(*)",
+            "open": f"SUM(t.status IN ({_OPEN_LIST}))",
+            "sla_breaches": "SUM(t.sla_breach)",
+            "avg_satisfaction": "ROUND(AVG(t.satisfaction_rating), 2)",
+        },
+    },
+    "customers": {
+        "source": "customers c",
+        "time": "c.created_at",
+        "dimensions": {
+            "customer": "c.name",
+            "region": "c.region",
+            "industry": "c.industry",
+            "plan_type": "c.plan_type",
+            "lifecycle_stage": "c.lifecycle_stage",
+            "company_size": "c.company_size",
+            "health_band": _HEALTH_BAND,
+        },
+        "measures": {
+            "count": "COUNT(*)",
+            "mrr": "SUM(c.mrr)",
+            "avg_mrr": "ROUND(AVG(c.mrr), 2)",
+            "avg_health": "ROUND(AVG(c.health_score), 1)",
+        },
+    },
+    "interactions": {
+        "source": "interactions i LEFT JOIN customers c ON c.id = i.customer_id",
+        "time": "i.created_at",
+        "dimensions": {
+            "customer": "c.name",
+            "type": "i.interaction_type",
+            "author": "i.created_by",
+            "region": "c.region",
+        },
+        "measures": {"count": "COUNT(*)"},
+    },
+}
+
+TIME_BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+CHART_CACHE_SIZE = 256
+_cache = OrderedDict()
+# Sync endpoints run on the threadpool, so cache reads and writes are serialized
+_cache_lock = threading.Lock()
+
+
+def _is_filter_value(value) -> bool:
+    """A value sqlite can bind: a scalar or a non-empty list of scalars."""
+    if isinstance(value, list):
+        return bool(value) and all(isinstance(item, (str, int, float, bool)) for item in value)
+    return isinstance(value, (str, int, float, bool))
+
+
+def normalize_spec(spec: dict) -> dict:
+    """Validate a chart spec and fill in defaults; raises ValueError on anything unknown."""
+    entity = spec.get("entity", "tickets")
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity '{entity}'")
+    schema = ENTITIES[entity]
+
+    measure = spec.get("measure", "count")
+    if measure not in schema["measures"]:
+        raise ValueError(f"Unknown measure '{measure}' for {entity}")
+
+    dimension = spec.get("dimension")
+    time_bucket = spec.get("time_bucket")
+    if dimension and time_bucket:
+        raise ValueError("Use either a dimension or a time_bucket, not both")
+    if not dimension and not time_bucket:
+        raise ValueError("A dimension or a time_bucket is required")
+    if dimension and dimension not in schema["dimensions"]:
+        raise ValueError(f"Unknown dimension '{dimension}' for {entity}")
+    if time_bucket and time_bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unknown time_bucket '{time_bucket}'")
+
+    filters = spec.get("filters") or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object of dimension to value")
+    for field, wanted in filters.items():
+        if field not in schema["dimensions"]:
+            raise ValueError(f"Cannot filter {entity} on '{field}'")
+        if not _is_filter_value(wanted):
+            raise ValueError(f"Filter on '{field}' must be a string, number, boolean or a non-empty list of those")
+
+    top_k = spec.get("top_k")
+    if top_k is not None and int(top_k) <= 0:
+        raise ValueError("top_k must be positive")
+
+    return {
+        "entity": entity,
+        "measure": measure,
+        "dimension": dimension,
+        "time_bucket": time_bucket,
+        "filters": filters,
+        "top_k": int(top_k) if top_k is not None else None,
+    }
+
+
+def compile_spec(spec: dict):
+    """Compile a normalized spec into a single GROUP BY query and its arguments."""
+    schema = ENTITIES[spec["entity"]]
+    if spec["time_bucket"]:
+        label = f"strftime('{TIME_BUCKETS[spec['time_bucket']]}', {schema['time']})"
+    else:
+        label = schema["dimensions"][spec["dimension"]]
+    value = schema["measures"][spec["measure"]]
+
+    clauses, args = [], []
+    for field, wanted in spec["filters"].items():
+        column = schema["dimensions"][field]
+        if isinstance(wanted, list):
+            clauses.append(f"{column} IN ({','.join('?' for _ in wanted)})")
+            args.extend(wanted)
+        else:
+            clauses.append(f"{column} = ?")
+            args.append(wanted)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    # Time series read left to right; categories rank by value
+    order = "label ASC" if spec["time_bucket"] else "value DESC, label ASC"
+    sql = (
+        f"SELECT {label} AS label, {value} AS value FROM {schema['source']}{where} "
+        f"GROUP BY label ORDER BY {order}"
+    )
+    if spec["top_k"]:
+        sql += " LIMIT ?"
+        args.append(spec["top_k"])
+    return sql, args
+
+
+def run_chart_query(conn, spec: dict) -> dict:
+    """Return labels and values for a chart spec, served from cache while nothing has changed."""
+    spec = normalize_spec(spec)
+    cursor = latest_cursor(conn)
+    key = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached["cursor"] == cursor:
+            _cache.move_to_end(key)
+            return {**cached["result"], "cached": True}
+
+    sql, args = compile_spec(spec)
+    data = conn.execute(sql, args).fetchall()
+    result = {
+        "spec": spec,
+        "labels": [row[0] if row[0] is not None else "Unknown" for row in data],
+        "values": [row[1] or 0 for row in data],
+    }
+    with _cache_lock:
+        _cache[key] = {"cursor": cursor, "result": result}
+        _cache.move_to_end(key)
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return {**result, "cached": False}
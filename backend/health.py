@@ -0,0 +1,180 @@
+# ABOUTME: Batch recomputation of customer health scores from tickets, interactions and MRR
+# ABOUTME: Bulk-loads per-customer columns in one query, scores them column-wise and writes back in one transaction
+import math
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from backend.models import OPEN_TICKET_STATUSES
+from backend.timestamps import register_utc, to_utc, utc_iso
+
+DB_PATH = os.getenv("DB_PATH", "backend/db.sqlite3")
+
+# Interactions newer than this count towards engagement
+ENGAGEMENT_WINDOW_DAYS = 30
+
+
+def init_health_tables(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS health_score_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mode TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            customers_updated INTEGER
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_customer_status ON tickets(customer_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_interactions_customer ON interactions(customer_id, created_at)")
+    conn.commit()
+
+
+def _touched_customer_ids(conn, since: str):
+    """Customers with any ticket, note, interaction or activity change after `since`.
+
+    Stored timestamps mix naive local and UTC 'Z' strings, so each is normalised with
+    utc() before comparing against the UTC watermark. Both sides are whole seconds, so
+    changes in the watermark's own second are included rather than risk skipping them.
+    """
+    cur = conn.execute(
+        """
+        SELECT customer_id FROM tickets
+         WHERE utc(created_at) >= :since OR utc(updated_at) >= :since OR utc(resolved_at) >= :since
+        UNION
+        SELECT t.customer_id FROM notes n JOIN tickets t ON t.id = n.ticket_id
+         WHERE utc(n.created_at) >= :since
+        UNION
+        SELECT customer_id FROM interactions WHERE utc(created_at) >= :since
+        UNION
+        SELECT id FROM customers WHERE utc(created_at) >= :since OR utc(last_activity) >= :since
+        """,
+        {"since": since},
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def _load_columns(conn, now: str, customer_ids=None):
+    """Load one row of health inputs per customer and transpose into columns."""
+    open_list = ",".join(f"'{s}'" for s in OPEN_TICKET_STATUSES)
+    scope = ""
+    if customer_ids is not None:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS health_scope (id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM health_scope")
+        conn.executemany("INSERT OR IGNORE INTO health_scope VALUES (?)", [(i,) for i in customer_ids])
+        scope = "WHERE c.id IN (SELECT id FROM health_scope)"
+
+    engagement_since = utc_iso(to_utc(now) - timedelta(days=ENGAGEMENT_WINDOW_DAYS))
+    cur = conn.execute(
+        f"""
+        SELECT c.id,
+               COALESCE(c.mrr, 0),
+               COALESCE(t.open_tickets, 0),
+               COALESCE(t.critical_open, 0),
+               COALESCE(t.high_open, 0),
+               COALESCE(t.open_age_days, 0),
+               COALESCE(t.sla_breaches, 0),
+               t.avg_satisfaction,
+               COALESCE(i.recent_interactions, 0)
+          FROM customers c
+          LEFT JOIN (
+                SELECT customer_id,
+                       SUM(status IN ({open_list})) AS open_tickets,
+                       SUM(status IN ({open_list}) AND priority = 'critical') AS critical_open,
+                       SUM(status IN ({open_list}) AND priority = 'high') AS high_open,
+                       AVG(CASE WHEN status IN ({open_list})
+                                THEN julianday(:now) - julianday(utc(created_at)) END) AS open_age_days,
+                       SUM(sla_breach) AS sla_breaches,
+                       AVG(satisfaction_rating) AS avg_satisfaction
+                  FROM tickets
+                 GROUP BY customer_id
+          ) t ON t.customer_id = c.id
+          LEFT JOIN (
+                SELECT customer_id, COUNT(*) AS recent_interactions
+                  FROM interactions
+                 WHERE utc(created_at) >= :engagement_since
+                 GROUP BY customer_id
+          ) i ON i.customer_id = c.id
+          {scope}
+        """,
+        {"now": now, "engagement_since": engagement_since},
+    )
+    data = cur.fetchall()
+    if not data:
+        return None
+    names = (
+        "id",
+        "mrr",
+        "open_tickets",
+        "critical_open",
+        "high_open",
+        "open_age_days",
+        "sla_breaches",
+        "avg_satisfaction",
+        "recent_interactions",
+    )
+    return dict(zip(names, (list(col) for col in zip(*data))))
+
+
+def score_columns(cols: dict):
+    """Compute health scores column-wise; every input column has one entry per customer."""
+    ticket_load = [min(20, 4 * n) for n in cols["open_tickets"]]
+    severity = [min(30, 12 * c + 6 * h) for c, h in zip(cols["critical_open"], cols["high_open"])]
+    ageing = [min(15, 0.5 * d) for d in cols["open_age_days"]]
+    breaches = [min(24, 8 * b) for b in cols["sla_breaches"]]
+    satisfaction = [0 if s is None else 5 * (s - 3) for s in cols["avg_satisfaction"]]
+    engagement = [2 * min(4, n) for n in cols["recent_interactions"]]
+    revenue = [min(5, math.log1p(m / 1000)) for m in cols["mrr"]]
+
+    return [
+        int(round(max(0, min(100, 100 - tl - sv - ag - br + sa + en + rv))))
+        for tl, sv, ag, br, sa, en, rv in zip(
+            ticket_load, severity, ageing, breaches, satisfaction, engagement, revenue
+        )
+    ]
+
+
+def recompute_health_scores(incremental: bool = False, now: datetime = None):
+    """Recompute `customers.health_score` for all customers, or only those touched since the last run."""
+    # Watermarks are stored and compared as canonical UTC strings
+    now_iso = utc_iso(now or datetime.now())
+    conn = sqlite3.connect(DB_PATH)
+    register_utc(conn)
+    init_health_tables(conn)
+
+    customer_ids = None
+    since = None
+    if incremental:
+        last = conn.execute(
+            "SELECT started_at FROM health_score_runs WHERE finished_at IS NOT NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if last:
+            # Runs recorded before the UTC switch hold naive local times
+            since = utc_iso(last[0])
+            customer_ids = _touched_customer_ids(conn, since)
+
+    cols = None if customer_ids == [] else _load_columns(conn, now_iso, customer_ids)
+    scores = score_columns(cols) if cols else []
+    ids = cols["id"] if cols else []
+
+    with conn:
+        conn.executemany(
+            "UPDATE customers SET health_score = ? WHERE id = ?", list(zip(scores, ids))
+        )
+        conn.execute(
+            "INSERT INTO health_score_runs (mode, started_at, finished_at, customers_updated) VALUES (?, ?, ?, ?)",
+            ("incremental" if since else "full", now_iso, utc_iso(datetime.now()), len(ids)),
+        )
+    conn.close()
+
+    return {
+        "mode": "incremental" if since else "full",
+        "since": since,
+        "customers_updated": len(ids),
+        "scores": dict(zip(ids, scores)),
+    }
+
+
+if __name__ == "__main__":
+    print(recompute_health_scores())
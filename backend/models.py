@@ -3,6 +3,11 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 
+# Ticket statuses that still need work from the support team
+OPEN_TICKET_STATUSES = ("open", "in_progress", "waiting_customer")
+# Ticket statuses that are finished; these are what archival moves out of the hot tables
+CLOSED_TICKET_STATUSES = ("resolved", "closed")
+
 
 class CustomerBase(BaseModel):
     name: str
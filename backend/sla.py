@@ -0,0 +1,162 @@
+# ABOUTME: SLA evaluation engine for open tickets
+# ABOUTME: Computes age, first-response time and breach risk in one pass and persists them for the triage queue
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from backend.models import OPEN_TICKET_STATUSES
+from backend.timestamps import to_utc, utc_now
+
+DB_PATH = os.getenv("DB_PATH", "backend/db.sqlite3")
+
+# (first response, resolution) targets in hours per priority
+SLA_TARGETS = {
+    "critical": (1, 24),
+    "high": (4, 72),
+    "medium": (8, 120),
+    "low": (24, 240),
+}
+
+# Re-evaluate before serving the triage queue if the stored risk is older than this
+SLA_REFRESH_SECONDS = int(os.getenv("SLA_REFRESH_SECONDS", "60"))
+
+_last_evaluated = 0.0
+
+_OPEN_LIST = ",".join(f"'{s}'" for s in OPEN_TICKET_STATUSES)
+
+
+def init_sla_columns(conn):
+    """Add the persisted risk column and the partial index the triage queue reads from."""
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(tickets)")}
+    if not columns:
+        return
+    if "sla_risk" not in columns:
+        conn.execute("ALTER TABLE tickets ADD COLUMN sla_risk REAL DEFAULT 0")
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_tickets_open_sla_risk "
+        f"ON tickets(sla_risk DESC) WHERE status IN ({_OPEN_LIST})"
+    )
+    conn.commit()
+
+
+def assess(ticket: dict, now: datetime) -> dict:
+    """Compute SLA figures for a single ticket row; timestamps are compared in UTC."""
+    now = to_utc(now)
+    response_target, resolution_target = SLA_TARGETS.get(ticket["priority"] or "medium", SLA_TARGETS["medium"])
+    created = to_utc(ticket["created_at"])
+    # Resolved tickets stop ageing at resolution
+    end = to_utc(ticket["resolved_at"]) if ticket["resolved_at"] else now
+    age_hours = max(0.0, (end - created).total_seconds() / 3600)
+
+    if ticket["first_response_at"]:
+        response_hours = max(0.0, (to_utc(ticket["first_response_at"]) - created).total_seconds() / 3600)
+    else:
+        response_hours = None
+    # An unanswered ticket keeps accruing response time until someone replies
+    pending_response = age_hours if response_hours is None else response_hours
+
+    risk = round(max(pending_response / response_target, age_hours / resolution_target), 3)
+    return {
+        "ticket_id": ticket["id"],
+        "priority": ticket["priority"],
+        "age_hours": round(age_hours, 1),
+        "days_old": int(age_hours // 24),
+        "time_to_first_response_hours": None if response_hours is None else round(response_hours, 1),
+        "response_target_hours": response_target,
+        "resolution_target_hours": resolution_target,
+        "sla_risk": risk,
+        "sla_breach": risk >= 1,
+    }
+
+
+def evaluate_open_tickets(now: datetime = None):
+    """Recompute SLA risk for every open ticket and persist it in one transaction."""
+    global _last_evaluated
+    now = to_utc(now) if now else utc_now()
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    init_sla_columns(conn)
+
+    tickets = conn.execute(
+        f"SELECT id, priority, created_at, first_response_at, resolved_at FROM tickets WHERE status IN ({_OPEN_LIST})"
+    ).fetchall()
+    assessments = [assess(t, now) for t in tickets]
+
+    with conn:
+        conn.executemany(
+            "UPDATE tickets SET sla_risk = ?, sla_breach = ? WHERE id = ?",
+            [(a["sla_risk"], int(a["sla_breach"]), a["ticket_id"]) for a in assessments],
+        )
+    conn.close()
+    _last_evaluated = time.monotonic()
+
+    return {
+        "evaluated": len(assessments),
+        "breached": sum(a["sla_breach"] for a in assessments),
+        "at_risk": sum(0.5 <= a["sla_risk"] < 1 for a in assessments),
+        "evaluated_at": now.isoformat(),
+    }
+
+
+def triage_queue(limit: int = 10, min_risk: float = 0.0):
+    """Return the `limit` open tickets with the highest stored SLA risk."""
+    if time.monotonic() - _last_evaluated > SLA_REFRESH_SECONDS:
+        evaluate_open_tickets()
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    now = utc_now()
+    queue = []
+    for row in conn.execute(
+        f"""
+        SELECT t.id, t.customer_id, c.name AS customer_name, t.title, t.status, t.priority,
+               t.assigned_to, t.created_at, t.first_response_at, t.sla_risk, t.sla_breach
+          FROM tickets t INDEXED BY idx_tickets_open_sla_risk
+          LEFT JOIN customers c ON c.id = t.customer_id
+         WHERE t.status IN ({_OPEN_LIST}) AND t.sla_risk >= ?
+         ORDER BY t.sla_risk DESC
+         LIMIT ?
+        """,
+        (min_risk, limit),
+    ):
+        ticket = dict(row)
+        ticket["days_old"] = int((now - to_utc(ticket["created_at"])).total_seconds() // 86400)
+        queue.append(ticket)
+    conn.close()
+    return queue
+
+
+def open_ticket_book(now: datetime = None) -> dict:
+    """Every open ticket in one query, returned column-wise to keep large books compact."""
+    now = to_utc(now) if now else utc_now()
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(
+        f"""
+        SELECT t.id, t.customer_id, c.name, t.priority, t.assigned_to, t.created_at, t.sla_risk
+          FROM tickets t
+          LEFT JOIN customers c ON c.id = t.customer_id
+         WHERE t.status IN ({_OPEN_LIST})
+        """
+    ).fetchall()
+    conn.close()
+    # Ages are computed here rather than with julianday(), which reads naive local times as UTC
+    data = [(*row[:5], int((now - to_utc(row[5])).total_seconds() // 86400), row[6]) for row in rows]
+    names = ("id", "customer_id", "customer_name", "priority", "assigned_to", "days_old", "sla_risk")
+    columns = list(zip(*data)) if data else [()] * len(names)
+    return {name: list(values) for name, values in zip(names, columns)}
+
+
+def ticket_sla(ticket_id: str, now: datetime = None):
+    """Evaluate a single ticket, open or not; returns None if it does not exist."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute(
+        "SELECT id, status, priority, created_at, first_response_at, resolved_at FROM tickets WHERE id = ?",
+        (ticket_id,),
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    result = assess(row, now or utc_now())
+    result["status"] = row["status"]
+    return result
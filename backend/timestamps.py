@@ -0,0 +1,30 @@
+# ABOUTME: Timezone-aware UTC handling for the mixed timestamp formats stored in the CRM database
+# ABOUTME: Seed rows hold naive local isoformat() values while endpoints write UTC 'Z' strings; both normalise here
+from datetime import datetime, timezone
+
+
+def to_utc(value) -> datetime:
+    """Timezone-aware UTC datetime for a stored timestamp string or a datetime.
+
+    Values carrying 'Z' or an offset are converted; naive values were written with
+    datetime.now(), so they are taken as host local time.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.astimezone(timezone.utc)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def utc_iso(value) -> str:
+    """Canonical stored form, matching strftime('%Y-%m-%dT%H:%M:%SZ','now') in SQL."""
+    return to_utc(value).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def register_utc(conn):
+    """Add utc(ts) to a connection so SQL can compare stored timestamps in their canonical UTC form."""
+    conn.create_function("utc", 1, lambda ts: None if ts is None else utc_iso(ts), deterministic=True)
@@ -58,6 +58,8 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ onViewChange }) => {
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [toolExecutions, setToolExecutions] = useState<string[]>([]);
+  // Server-side conversation the agent keeps for follow-up questions
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -79,6 +81,31 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ onViewChange }) => {
             toolCall: data.name,
           };
           setMessages(prev => [...prev, logMessage]);
+        } else if (data.type === 'tool_call_started') {
+          const logMessage: Message = {
+            id: `${Date.now()}-${data.id ?? data.name}`,
+            type: 'system',
+            content: `🔧 ${data.name} started`,
+            timestamp: new Date().toISOString(),
+            toolCall: data.name,
+          };
+          setMessages(prev => [...prev, logMessage]);
+        } else if (data.type === 'assistant_delta') {
+          // Grow the in-progress reply for this task as tokens arrive
+          const streamId = `stream-${data.task_id}`;
+          setMessages(prev => {
+            if (!prev.some(msg => msg.id === streamId)) {
+              return [...prev, {
+                id: streamId,
+                type: 'agent',
+                content: data.text,
+                timestamp: new Date().toISOString(),
+              }];
+            }
+            return prev.map(msg =>
+              msg.id === streamId ? { ...msg, content: msg.content + data.text } : msg
+            );
+          });
         }
       } catch (err) {
         console.error('Failed to parse log message', err);
@@ -129,12 +156,13 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ onViewChange }) => {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ message: userInput }),
+        body: JSON.stringify({ message: userInput, session_id: sessionId }),
       });
 
       if (!response.ok) throw new Error('Failed to send message');
       
       const data = await response.json();
+      if (data.session_id) setSessionId(data.session_id);
 
       // Clear tool executions
       setToolExecutions([]);
@@ -148,7 +176,14 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ onViewChange }) => {
         isTyping: true
       };
 
-      setMessages(prev => [...prev, typingMessage]);
+      // The final reply replaces any streamed draft; skip re-typing text the user already watched arrive
+      setMessages(prev => {
+        const streamed = prev.some(msg => msg.id.startsWith('stream-'));
+        return [
+          ...prev.filter(msg => !msg.id.startsWith('stream-')),
+          { ...typingMessage, isTyping: !streamed },
+        ];
+      });
 
       // Handle view changes based on agent response
       if (data.view_change) {